@@ -1,15 +1,84 @@
 from flask import Flask
+from flask.json.provider import JSONProvider, DefaultJSONProvider
 from flask_cors import CORS
+import atexit
 import logging
 import os
-from app.config import Config
-from supabase import create_client
+import queue
+import orjson
+from logging.handlers import QueueHandler, QueueListener
+from app.config import Config, init_supabase
 
 logger = logging.getLogger(__name__)
 
 
+class ORJSONProvider(JSONProvider):
+    """JSON provider backed by orjson (numpy arrays serialized natively)."""
+
+    OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def _setup_logging(root_logger):
+    """
+    Route log records through a queue so file/console writes happen on a
+    background listener thread instead of the request thread.
+    """
+    formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+    handlers = [logging.FileHandler('medical_processor.log'), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root_logger.addHandler(QueueHandler(log_queue))
+    root_logger.setLevel(logging.INFO)
+
+
+def reset_logging():
+    """Restart queued logging in a forked child (the listener thread does not survive fork)."""
+    root_logger = logging.getLogger()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    _setup_logging(root_logger)
+
+
+_preloaded = False
+
+
+def _preload():
+    """
+    Import the heavy readers and warm active model weights before workers fork,
+    so children share the pages copy-on-write instead of loading them each.
+    """
+    global _preloaded
+    if _preloaded:
+        return
+    _preloaded = True
+
+    try:
+        import numpy  # noqa: F401
+        import nibabel  # noqa: F401
+        import pydicom  # noqa: F401
+
+        from app.services.model_manager import ModelManager
+        count = ModelManager.preload_active_models()
+        logger.info(f"✅ Preloaded readers and {count} model file(s)")
+    except Exception as e:
+        logger.warning(f"Preload failed: {e}")
+
+
 def create_app():
     app = Flask(__name__)
+    app.json = ORJSONProvider(app)
     app.config.from_object(Config)
 
     CORS(app, origins=["*"])
@@ -17,14 +86,10 @@ def create_app():
     # Configure logging only if not already configured (prevent duplicate handlers)
     root_logger = logging.getLogger()
     if not root_logger.handlers:
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
-            handlers=[
-                logging.FileHandler('medical_processor.log'),
-                logging.StreamHandler()
-            ]
-        )
+        _setup_logging(root_logger)
+
+    if Config.PRELOAD:
+        _preload()
 
     # Ensure directories exist
     for directory in [app.config['UPLOAD_FOLDER'], app.config['PROCESSED_FOLDER']]:
@@ -32,11 +97,9 @@ def create_app():
     for view in ['axial', 'coronal', 'sagittal']:
         os.makedirs(os.path.join(app.config['BASE_PATH'], view), exist_ok=True)
 
-    # Supabase client
+    # Supabase client (one per process, shared by every app instance)
     try:
-        app.extensions = getattr(app, 'extensions', {})
-        app.extensions['supabase'] = create_client(app.config['SUPABASE_URL'], app.config['SUPABASE_KEY'])
-        print('')
+        app.extensions['supabase'] = init_supabase(Config)
     except Exception:
         app.extensions['supabase'] = None
 
@@ -1,5 +1,9 @@
 from flask import Blueprint, request, jsonify
 from app.services.model_manager import ModelManager
+from app.services.model_cache import (
+    get_active_cached, get_all_models_cached,
+    invalidate_active_models, invalidate_models_list
+)
 import logging
 
 models_bp = Blueprint('models', __name__)
@@ -24,9 +28,10 @@ def register_model():
         file = request.files.get('file')
         if file and file.filename:
             from werkzeug.utils import secure_filename
+            from pathlib import Path
             import os
+            import shutil
             
-            filename = secure_filename(file.filename)
             filename = secure_filename(file.filename)
             
             # [NEW] Organize by type
@@ -36,12 +41,12 @@ def register_model():
                 save_dir = "models/pano"
             
             # Ensure safe directory existence
-            if not os.path.exists(save_dir):
-                os.makedirs(save_dir)
+            Path(save_dir).mkdir(parents=True, exist_ok=True)
                 
-            # Save file
+            # Save file in 1 MB blocks (model weights are large)
             file_path = os.path.join(save_dir, filename)
-            file.save(file_path)
+            with open(file_path, 'wb', buffering=1 << 20) as f:
+                shutil.copyfileobj(file.stream, f, length=1 << 20)
             
             # Use the saved relative path
             path = file_path.replace("\\", "/")
@@ -51,6 +56,7 @@ def register_model():
             return jsonify({'error': 'Name and path (or file) required'}), 400
             
         model = ModelManager.register_model(name, path, model_type, threshold)
+        invalidate_models_list()
         return jsonify(model), 201
     except Exception as e:
         logger.error(f"Error registering model: {e}")
@@ -60,8 +66,8 @@ def register_model():
 def list_models():
     """List all registered models."""
     try:
-        models = ModelManager.get_all_models()
-        active_models = ModelManager.get_active_model()
+        models = get_all_models_cached()
+        active_models = get_active_cached()
         return jsonify({
             'models': models,
             'active_models': active_models
@@ -80,6 +86,7 @@ def set_active_model():
             return jsonify({'error': 'model_id required'}), 400
             
         ModelManager.set_active_model(model_id)
+        invalidate_active_models()
         return jsonify({'status': 'success', 'active_model_id': model_id})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -95,6 +102,7 @@ def deactivate_model():
             return jsonify({'error': 'type required'}), 400
             
         ModelManager.deactivate_model_type(model_type)
+        invalidate_active_models()
         return jsonify({'status': 'success', 'message': f'Model type {model_type} deactivated'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -105,6 +113,8 @@ def delete_model(model_id):
     try:
         success = ModelManager.delete_model(model_id)
         if success:
+            invalidate_active_models()
+            invalidate_models_list()
             return jsonify({'status': 'success', 'message': f'Model {model_id} deleted'}), 200
         else:
             return jsonify({'error': 'Model not found'}), 404
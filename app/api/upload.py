@@ -6,20 +6,23 @@ Handles file uploads for CBCT, Panoramic, and 3D medical reports.
 from flask import Blueprint, request, jsonify, current_app
 from typing import Tuple, Callable
 import os
+import gzip
 import logging
+import importlib
 
-from app.utils.exceptions import FileUploadError
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from app.utils.exceptions import FileUploadError, FileTooLargeError
 from app.utils.file_upload import (
-    validate_file_request,
-    save_uploaded_file,
+    validate_filename,
+    stream_multipart_upload,
+    finalize_streamed_file,
+    inflate_gzip_upload,
     extract_form_params,
     download_file_from_url
 )
 from app.utils.validators import validate_file_content
 from app.services.supabase_manager import update_report_status
-from app.domains.cbct.workflow import start_cbct_workflow
-from app.domains.pano.workflow import start_pano_workflow
-from app.domains.nifti.workflow import start_nifti_workflow
 
 
 
@@ -31,8 +34,20 @@ MEDICAL_FILE_EXTENSIONS = {'.nii', '.nii.gz', '.dcm', '.dicom', '.ima'}
 IMAGE_FILE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp'}
 MAX_IMAGE_SIZE = 50 * 1024 * 1024  # 50 MB
 
+# Domain workflow starters, imported on first use
+_STARTERS = {}
+
+
+def _get_workflow_starter(domain: str) -> Callable:
+    """Resolve app.domains.<domain>.workflow.start_<domain>_workflow lazily."""
+    starter = _STARTERS.get(domain)
+    if starter is None:
+        module = importlib.import_module(f"app.domains.{domain}.workflow")
+        starter = _STARTERS[domain] = getattr(module, f"start_{domain}_workflow")
+    return starter
 
-from app.utils.queue_utils import is_queue_full # [NEW]
+
+from app.utils.queue_utils import is_queue_full, release_queue_slot # [NEW]
 
 def _handle_file_upload(
     allowed_extensions: set,
@@ -46,15 +61,41 @@ def _handle_file_upload(
     if is_queue_full():
         return {'error': 'Server is busy. Too many requests. Please try again later.'}, 503
 
+    part_path = None
     try:
-        # 1. Extract parameters first
-        params = extract_form_params(request.form)
+        # 1. Parse the body straight from the input stream (no Werkzeug spooling)
+        if request.mimetype == 'multipart/form-data':
+            # Gzip-encoded bodies are inflated on the fly while parsing
+            stream = request.stream
+            if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+                stream = gzip.GzipFile(fileobj=stream, mode='rb')
+            
+            try:
+                form, part_path, original_filename, file_size = stream_multipart_upload(
+                    stream,
+                    request.headers,
+                    current_app.config['UPLOAD_FOLDER'],
+                    max_size
+                )
+            except (FileTooLargeError, RequestEntityTooLarge) as e:
+                return {
+                    'error': str(e) if isinstance(e, FileTooLargeError) else 'File too large',
+                    'max_size_mb': max_size / (1024 * 1024)
+                }, 413
+        else:
+            form = request.form
+        
+        params = extract_form_params(form)
         report_id = params['report_id']
         
         # 2. Check if URL or direct file
-        file_url = request.form.get('file_url')
+        file_url = form.get('file_url')
         
         if file_url:
+            if part_path:
+                os.remove(part_path)
+                part_path = None
+            
             # Download from URL
             logger.info(f"Downloading file from URL for {report_type} processing")
             try:
@@ -73,15 +114,12 @@ def _handle_file_upload(
                     update_report_status(report_id, "download_failed")
                 return {'error': f'URL download failed: {str(e)}'}, 400
         else:
-            # Direct file upload (existing logic)
-            file = request.files.get('file')
-            if not file:
+            # Direct file upload (already streamed to disk)
+            if not part_path:
                 return {'error': 'No file or file_url provided'}, 400
             
             try:
-                original_filename, sanitized_filename = validate_file_request(
-                    file, allowed_extensions
-                )
+                sanitized_filename = validate_filename(original_filename, allowed_extensions)
             except FileUploadError as e:
                 return {'error': str(e)}, 400
         
@@ -89,21 +127,38 @@ def _handle_file_upload(
         if report_id:
             update_report_status(report_id, "file_uploaded")
         
-        # 4. Save file (if not already downloaded from URL)
+        # 4. Move streamed file into place (if not already downloaded from URL)
         if not file_url:
             try:
-                save_path, file_size, upload_id = save_uploaded_file(
-                    file,
+                save_path, upload_id = finalize_streamed_file(
+                    part_path,
                     sanitized_filename,
                     current_app.config['UPLOAD_FOLDER'],
-                    params['upload_id'],
-                    max_size
+                    params['upload_id']
                 )
+                part_path = None
             except FileUploadError as e:
                 if report_id:
-                    update_report_status(report_id, "file_too_large")
+                    update_report_status(report_id, "upload_failed")
                 return {'error': str(e)}, 400
         
+        # Optionally store NIfTI uncompressed here (otherwise the worker's
+        # decode_volume step inflates it off the request path)
+        if sanitized_filename.lower().endswith('.nii.gz') and current_app.config['INFLATE_NIFTI_UPLOADS']:
+            try:
+                save_path = inflate_gzip_upload(save_path, current_app.config['MAX_INFLATED_SIZE'])
+            except FileUploadError as e:
+                os.remove(save_path)
+                if report_id:
+                    update_report_status(report_id, "invalid_file")
+                if isinstance(e, FileTooLargeError):
+                    return {
+                        'error': str(e),
+                        'max_size_mb': current_app.config['MAX_INFLATED_SIZE'] / (1024 * 1024)
+                    }, 413
+                return {'error': str(e)}, 400
+            sanitized_filename = sanitized_filename[:-3]
+        
         # 5. Validate file content (for medical files only)
         if validate_content:
             is_valid, validation_msg = validate_file_content(save_path, sanitized_filename)
@@ -150,6 +205,13 @@ def _handle_file_upload(
     except Exception as e:
         logger.error(f"Upload error in {report_type}: {e}", exc_info=True)
         return {'error': 'Internal server error'}, 500
+    finally:
+        # The published workflow tasks are now counted by the Celery signals
+        release_queue_slot()
+        
+        # Drop a streamed part that never made it to its final path
+        if part_path and os.path.exists(part_path):
+            os.remove(part_path)
 
 
 @upload_bp.route('/cbct-report-generated', methods=['POST'])
@@ -158,7 +220,7 @@ def upload_cbct_report():
         allowed_extensions=MEDICAL_FILE_EXTENSIONS,
         max_size=current_app.config['MAX_FILE_SIZE'],
         report_type='cbct',
-        workflow_starter=start_cbct_workflow,
+        workflow_starter=_get_workflow_starter('cbct'),
         validate_content=True
     )
     return jsonify(response), status
@@ -170,7 +232,7 @@ def upload_pano_report():
         allowed_extensions=IMAGE_FILE_EXTENSIONS,
         max_size=MAX_IMAGE_SIZE,
         report_type='pano',
-        workflow_starter=start_pano_workflow,
+        workflow_starter=_get_workflow_starter('pano'),
         validate_content=False
     )
     return jsonify(response), status
@@ -182,7 +244,7 @@ def upload_nifti_slices():
         allowed_extensions=MEDICAL_FILE_EXTENSIONS,
         max_size=current_app.config['MAX_FILE_SIZE'],
         report_type='nifti',
-        workflow_starter=start_nifti_workflow,
+        workflow_starter=_get_workflow_starter('nifti'),
         validate_content=True
     )
     return jsonify(response), status
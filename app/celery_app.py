@@ -6,10 +6,34 @@ Celery worker configuration and initialization.
 import logging
 import redis
 from celery import Celery
+from celery.signals import after_task_publish, celeryd_after_setup, task_prerun, task_revoked, worker_ready
 from app.config import Config
 
 logger = logging.getLogger(__name__)
 
+# Tasks published but not yet picked up by a worker (mirrors the queue length)
+PENDING_TASKS_KEY = "pending_tasks"
+PENDING_TASKS_TTL = 3600  # Same as visibility_timeout: a drifted count expires on its own
+
+# Inference vs upload/bookkeeping tasks; both queues default to 'celery',
+# so routing only splits work once the env names dedicated queues
+AI_TASKS = ('ai_analysis', 'analyze_pano_v2')
+IO_TASKS = (
+    'decode_volume', 'format_and_upload_report', 'upload_report_json',
+    'upload_slices', 'finalize_report', 'process_nifti_slices',
+    'finalize_nifti_workflow', 'validate_pano_v2', 'upload_pano_v2',
+    'aggregate_pano_v2',
+)
+
+# DECR that never drops below zero (counter may have been reset mid-flight)
+DECR_FLOOR_LUA = """
+local n = tonumber(redis.call('GET', KEYS[1]) or '0')
+if n > 0 then
+    return redis.call('DECR', KEYS[1])
+end
+return 0
+"""
+
 redis_client = None
 celery = None
 REDIS_AVAILABLE = False
@@ -53,6 +77,10 @@ def setup_redis_celery():
             broker_transport_options={
                 'visibility_timeout': 3600,
                 'retry_policy': {'timeout': 5.0}
+            },
+            task_routes={
+                **{name: {'queue': Config.CELERY_AI_QUEUE} for name in AI_TASKS},
+                **{name: {'queue': Config.CELERY_IO_QUEUE} for name in IO_TASKS},
             }
         )
         
@@ -73,3 +101,105 @@ def setup_redis_celery():
 setup_redis_celery()
 
 
+def broker_queue_length() -> int:
+    """Messages waiting in every queue tasks are routed to (Redis broker lists)."""
+    queues = {'celery', Config.CELERY_AI_QUEUE, Config.CELERY_IO_QUEUE}
+    return sum(redis_client.llen(queue) for queue in queues)
+
+
+def reconcile_pending_tasks():
+    """
+    Reset the pending_tasks counter to the broker's real queue length.
+    
+    The counter misses messages that never run (purged on worker start,
+    lost with the broker), so it is re-synced at worker start and whenever
+    it claims the queue is full.
+    
+    Returns:
+        The reconciled count, or None if Redis is unavailable
+    """
+    if not redis_client:
+        return None
+    try:
+        pending = broker_queue_length()
+        redis_client.set(PENDING_TASKS_KEY, pending, ex=PENDING_TASKS_TTL)
+        return pending
+    except Exception as e:
+        logger.warning(f"Failed to reconcile pending task count: {e}")
+        return None
+
+
+@after_task_publish.connect
+def _count_published_task(**kwargs):
+    if redis_client:
+        try:
+            pipe = redis_client.pipeline()
+            pipe.incr(PENDING_TASKS_KEY)
+            pipe.expire(PENDING_TASKS_KEY, PENDING_TASKS_TTL)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to count published task: {e}")
+
+
+@task_prerun.connect
+def _count_started_task(**kwargs):
+    if redis_client:
+        try:
+            redis_client.eval(DECR_FLOOR_LUA, 1, PENDING_TASKS_KEY)
+        except Exception as e:
+            logger.warning(f"Failed to count started task: {e}")
+
+
+@task_revoked.connect
+def _count_revoked_task(terminated=False, **kwargs):
+    # Revoked/expired before running: task_prerun never fired for it
+    if redis_client and not terminated:
+        try:
+            redis_client.eval(DECR_FLOOR_LUA, 1, PENDING_TASKS_KEY)
+        except Exception as e:
+            logger.warning(f"Failed to count revoked task: {e}")
+
+
+@worker_ready.connect
+def _reconcile_on_worker_ready(**kwargs):
+    """Start from the broker's real queue length (e.g. after a purge)."""
+    pending = reconcile_pending_tasks()
+    if pending is not None:
+        logger.info(f"Pending task count reconciled: {pending}")
+
+
+_flask_app = None
+
+
+def get_flask_app():
+    """Flask app for task app contexts, created once per worker process."""
+    global _flask_app
+    if _flask_app is None:
+        from app import create_app
+        _flask_app = create_app()
+    return _flask_app
+
+
+@celeryd_after_setup.connect
+def _warm_worker_models(sender, instance, **kwargs):
+    """
+    Build the CBCT analyzer once in the main worker process, before the pool forks.
+    
+    Children inherit it, so their startup stays within the process-init
+    timeout; the analyzer keeps models on the CPU until first use, so no
+    CUDA state crosses the fork. Skipped on workers not consuming the AI queue.
+    """
+    if not Config.WARM_WORKER_MODELS:
+        return
+    consume_from = instance.app.amqp.queues.consume_from
+    if consume_from and Config.CELERY_AI_QUEUE not in consume_from:
+        return
+    try:
+        from app.domains.cbct.analyzer import get_cbct_analyzer
+        from app.domains.cbct.config import resolve_model_configs
+        
+        segmentation_config, detection_config = resolve_model_configs()
+        get_cbct_analyzer(segmentation_config, detection_config)
+        logger.info("✅ CBCT analyzer warmed before forking the worker pool")
+    except Exception as e:
+        logger.warning(f"CBCT analyzer warm-up failed: {e}")
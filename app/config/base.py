@@ -25,6 +25,15 @@ class Config:
     MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', 1073741824))  # 1GB default
     MAX_CONTENT_LENGTH = MAX_FILE_SIZE  # Flask limit matched to custom limit
     MAX_QUEUE_SIZE = int(os.getenv('MAX_QUEUE_SIZE', 100))  # Max pending tasks
+    USE_IO_URING = os.getenv('USE_IO_URING', 'false').lower() == 'true'  # Batched slice writes (Linux 5.1+)
+    JPEG_OPTIMIZE = os.getenv('JPEG_OPTIMIZE', 'false').lower() == 'true'  # Extra Huffman pass: ~2x encode time for <5% smaller slices
+    DEBUG_PRETTY_JSON = os.getenv('DEBUG_PRETTY_JSON', 'false').lower() == 'true'  # Indent uploaded report JSON (dev only; ~2x bytes)
+    INFLATE_NIFTI_UPLOADS = os.getenv('INFLATE_NIFTI_UPLOADS', 'false').lower() == 'true'  # Inflate .nii.gz on the request thread (workers do it otherwise)
+    MAX_INFLATED_SIZE = int(os.getenv('MAX_INFLATED_SIZE', MAX_FILE_SIZE * 8))  # Cap on decompressed .nii.gz size (gzip bomb guard)
+    USE_GPU_SLICES = os.getenv('USE_GPU_SLICES', 'false').lower() == 'true'  # Opt-in CuPy + nvJPEG slice encode on a CUDA device
+    GPU_SLICE_MIN_VOXELS = int(os.getenv('GPU_SLICE_MIN_VOXELS', 256 ** 3))  # Smaller volumes are not worth the transfer
+    PRELOAD = os.getenv('PRELOAD', 'false').lower() == 'true'  # Warm imports/model files before forking workers
+    WARM_WORKER_MODELS = os.getenv('WARM_WORKER_MODELS', 'false').lower() == 'true'  # Build the CBCT analyzer in the Celery parent before forking
     
     # File Types
     ALLOWED_EXTENSIONS = {'.nii', '.nii.gz', '.dcm', '.dicom', '.ima'}
@@ -35,6 +44,8 @@ class Config:
     REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
     CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
     CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
+    CELERY_AI_QUEUE = os.getenv('CELERY_AI_QUEUE', 'celery')  # Model inference tasks (run few workers: -Q <name> -c 1)
+    CELERY_IO_QUEUE = os.getenv('CELERY_IO_QUEUE', 'celery')  # Upload/finalize tasks (run many workers)
     
     # Supabase (from environment ONLY - no hardcoded keys!)
     SUPABASE_URL = os.getenv('SUPABASE_URL')
@@ -4,6 +4,8 @@ Supabase Configuration
 Supabase client initialization and management.
 """
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
+import atexit
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,7 +16,7 @@ _supabase_client: Client = None
 
 def init_supabase(config) -> Client:
     """
-    Initialize Supabase client.
+    Initialize the process-wide Supabase client (reused if already created).
     
     Args:
         config: Config object with SUPABASE_URL and SUPABASE_KEY
@@ -28,13 +30,17 @@ def init_supabase(config) -> Client:
     """
     global _supabase_client
     
+    if _supabase_client is not None:
+        return _supabase_client
+    
     try:
         if not config.SUPABASE_URL or not config.SUPABASE_KEY:
             raise ValueError("Missing Supabase credentials in environment")
         
         _supabase_client = create_client(
             config.SUPABASE_URL,
-            config.SUPABASE_KEY
+            config.SUPABASE_KEY,
+            options=ClientOptions(postgrest_client_timeout=10, storage_client_timeout=60)
         )
         
         logger.info("✅ Supabase client initialized successfully")
@@ -58,3 +64,16 @@ def get_supabase() -> Client:
     if _supabase_client is None:
         raise RuntimeError("Supabase not initialized. Call init_supabase() first.")
     return _supabase_client
+
+
+@atexit.register
+def _close_supabase():
+    """Close the shared client's pooled HTTP connections on shutdown."""
+    if _supabase_client is None:
+        return
+    try:
+        session = getattr(_supabase_client.postgrest, 'session', None)
+        if session is not None:
+            session.close()
+    except Exception:
+        pass
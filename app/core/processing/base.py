@@ -4,19 +4,68 @@ Base Processing Classes
 Shared logic for medical file processing.
 """
 from typing import Dict, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
 from PIL import Image
+import io
 import os
+import threading
 import logging
 
+from app.config import Config
+from .writer import write_file, flush_writes
+from .kernels import NUMBA_AVAILABLE, slice_is_valid, minmax, normalize_to_uint8
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_GRAY, TJSAMP_GRAY
+    _tj = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    _tj = None  # libjpeg-turbo missing, fall back to PIL
+
+_pil_buffers = threading.local()
+
 logger = logging.getLogger(__name__)
 
 
+def encode_jpeg(slice_data: np.ndarray, quality: int = 85) -> bytes:
+    """
+    Encode a 2D uint8 slice as grayscale JPEG bytes.
+    
+    Uses libjpeg-turbo's SIMD encoder when available, PIL otherwise.
+    
+    Args:
+        slice_data: 2D uint8 slice array
+        quality: JPEG quality (1-100)
+        
+    Returns:
+        JPEG file contents
+    """
+    if _tj is not None:
+        return _tj.encode(
+            np.ascontiguousarray(slice_data)[..., None],
+            quality=quality,
+            pixel_format=TJPF_GRAY,
+            jpeg_subsample=TJSAMP_GRAY
+        )
+    
+    # One scratch buffer per thread, rewound instead of reallocated per slice
+    buffer = getattr(_pil_buffers, 'buffer', None)
+    if buffer is None:
+        buffer = _pil_buffers.buffer = io.BytesIO()
+    buffer.seek(0)
+    buffer.truncate()
+    
+    img = Image.fromarray(slice_data, mode='L')
+    img.save(buffer, format='JPEG', quality=quality, optimize=Config.JPEG_OPTIMIZE, progressive=False)
+    return buffer.getvalue()
+
+
 class SliceGenerator:
     """Base class for generating 2D slices from 3D volume."""
     
     VIEWS = ['axial', 'coronal', 'sagittal']
     AXES = {'axial': 2, 'coronal': 1, 'sagittal': 0}
+    NORMALIZE_TILE_BYTES = 4 * 1024 * 1024  # float32 scratch per tile
     
     @staticmethod
     def normalize_volume(volume: np.ndarray) -> np.ndarray:
@@ -29,14 +78,40 @@ class SliceGenerator:
         Returns:
             Normalized volume as uint8
         """
-        volume_min, volume_max = volume.min(), volume.max()
+        # Column-major input (NIfTI memmaps): run on the transposed C-order
+        # view so every pass streams memory sequentially
+        if volume.ndim == 3 and volume.flags.f_contiguous and not volume.flags.c_contiguous:
+            return SliceGenerator.normalize_volume(volume.T).T
+        
+        volume_min, volume_max = minmax(volume)
+        
+        # Already full-range uint8 (e.g. fused DICOM rescale): nothing to do
+        if volume.dtype == np.uint8 and volume_min == 0 and volume_max == 255:
+            return volume
         
         if volume_max == volume_min:
             logger.warning("Constant intensity volume detected")
             return np.zeros_like(volume, dtype=np.uint8)
         
-        normalized = (volume - volume_min) / (volume_max - volume_min) * 255
-        return normalized.astype(np.uint8)
+        scale = np.float32(255.0 / (volume_max - volume_min))
+        
+        if NUMBA_AVAILABLE and volume.ndim == 3:
+            return normalize_to_uint8(volume, volume_min, scale)
+        
+        normalized = np.empty(volume.shape, dtype=np.uint8)
+        
+        # Work in cache-sized float32 tiles along axis 0 instead of
+        # materializing full-volume float64 temporaries
+        plane_bytes = max(1, volume[0].size * 4)
+        step = max(1, SliceGenerator.NORMALIZE_TILE_BYTES // plane_bytes)
+        
+        for start in range(0, volume.shape[0], step):
+            tile = np.subtract(volume[start:start + step], volume_min, dtype=np.float32)
+            tile *= scale
+            np.clip(tile, 0, 255, out=tile)
+            normalized[start:start + step] = tile
+        
+        return normalized
     
     @staticmethod
     def extract_slice(volume: np.ndarray, axis: int, index: int) -> np.ndarray:
@@ -69,13 +144,12 @@ class SliceGenerator:
         Returns:
             True if slice has content
         """
-        return np.any(slice_data) and np.std(slice_data) > 1
+        return slice_is_valid(slice_data)
     
     @staticmethod
     def save_slice(
         slice_data: np.ndarray,
-        output_dir: str,
-        view: str,
+        view_dir: str,
         index: int,
         quality: int = 85
     ) -> Optional[str]:
@@ -84,8 +158,7 @@ class SliceGenerator:
         
         Args:
             slice_data: 2D slice array
-            output_dir: Base output directory
-            view: View name (axial/coronal/sagittal)
+            view_dir: Existing view directory (output_dir/view)
             index: Slice index for filename
             quality: JPEG quality (1-100)
             
@@ -96,14 +169,18 @@ class SliceGenerator:
         if not SliceGenerator.is_valid_slice(slice_data):
             return None
         
-        # Create view directory
-        view_dir = os.path.join(output_dir, view)
-        os.makedirs(view_dir, exist_ok=True)
-        
-        # Save image
-        img = Image.fromarray(slice_data, mode='L')
-        slice_path = os.path.join(view_dir, f"{index}.jpg")
-        img.save(slice_path, quality=quality, optimize=True)
+        return SliceGenerator._write_slice(slice_data, view_dir, index, quality)
+    
+    @staticmethod
+    def _write_slice(
+        slice_data: np.ndarray,
+        view_dir: str,
+        index: int,
+        quality: int = 85
+    ) -> str:
+        # Encode in memory, then hand the bytes to the writer
+        slice_path = f"{view_dir}/{index}.jpg"
+        write_file(slice_path, encode_jpeg(slice_data, quality))
         
         return slice_path
     
@@ -127,24 +204,49 @@ class SliceGenerator:
         volume_normalized = SliceGenerator.normalize_volume(volume)
         slice_counts = {}
         
-        for view in SliceGenerator.VIEWS:
-            axis = SliceGenerator.AXES[view]
-            slice_count = volume_normalized.shape[axis]
-            saved_count = 0
-            
-            logger.info(f"Generating {slice_count} {view} slices...")
-            
-            for i in range(slice_count):
-                slice_data = SliceGenerator.extract_slice(volume_normalized, axis, i)
+        # Create view directories once instead of per slice
+        view_dirs = {view: os.path.join(output_dir, view) for view in SliceGenerator.VIEWS}
+        for view_dir in view_dirs.values():
+            os.makedirs(view_dir, exist_ok=True)
+        
+        # JPEG encoding and file writes release the GIL, so overlap them
+        # across slices; validation stays in order to keep indices sequential
+        with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+            for view in SliceGenerator.VIEWS:
+                axis = SliceGenerator.AXES[view]
+                slice_count = volume_normalized.shape[axis]
+                futures = []
+                
+                logger.info(f"Generating {slice_count} {view} slices...")
+                
+                # One C-contiguous copy per view (none for axis 0) so every
+                # slice is a contiguous row-major buffer for the encoder
+                view_volume = np.ascontiguousarray(np.moveaxis(volume_normalized, axis, 0))
                 
-                if SliceGenerator.save_slice(slice_data, output_dir, view, saved_count):
+                for i in range(slice_count):
+                    slice_data = view_volume[i]
+                    
+                    if SliceGenerator.is_valid_slice(slice_data):
+                        futures.append(executor.submit(
+                            SliceGenerator._write_slice,
+                            slice_data, view_dirs[view], len(futures)
+                        ))
+                    
+                    # Progress callback (scan position, as before the pool)
+                    if progress_callback and i % 20 == 0:
+                        progress_callback(view, i, slice_count)
+                
+                saved_count = 0
+                for future in as_completed(futures):
+                    future.result()
                     saved_count += 1
                 
-                # Progress callback
-                if progress_callback and i % 20 == 0:
-                    progress_callback(view, i, slice_count)
-            
-            slice_counts[view] = saved_count
-            logger.info(f"✅ Created {saved_count} {view} slices")
+                view_volume = slice_data = None  # Release before the next view copy
+                
+                slice_counts[view] = saved_count
+                logger.info(f"✅ Created {saved_count} {view} slices")
+        
+        # Make sure queued writes are on disk before callers read the slices
+        flush_writes()
         
         return slice_counts
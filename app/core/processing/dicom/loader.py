@@ -6,16 +6,60 @@ Load and validate DICOM files from directory.
 import os
 import pydicom
 import numpy as np
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import List, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
+# str.endswith with a tuple is a single C-level check (no splitext/lower per file)
+_DCM_SUFFIXES_LOWER = ('.dcm', '.dicom', '.ima')
+_DCM_SUFFIXES = _DCM_SUFFIXES_LOWER + ('.DCM', '.DICOM', '.IMA')
+
+DEFER_SIZE = 1024  # bytes
+PIXEL_KEYWORDS = ('PixelData', 'FloatPixelData', 'DoubleFloatPixelData')
+
+
+def _load_one(file_path: str) -> Tuple:
+    """
+    Read and decode one DICOM file (module-level so it pickles for worker processes).
+    
+    Returns:
+        (file_path, dataset, pixel_array) on success,
+        (file_path, None, error_message) on failure
+    """
+    try:
+        # Large elements (pixel data, big private blobs) are only read on access
+        ds = pydicom.dcmread(file_path, force=True, defer_size=DEFER_SIZE)
+        
+        # Validate has pixel data (tag check, no decode)
+        if not any(keyword in ds for keyword in PIXEL_KEYWORDS):
+            return file_path, None, "No pixel data"
+        
+        pixel_array = ds.pixel_array
+        
+        # Validate not empty
+        if pixel_array.size == 0:
+            return file_path, None, "Empty pixel array"
+        
+        # Decoded array travels separately; don't ship the encoded bytes too
+        for keyword in PIXEL_KEYWORDS:
+            if keyword in ds:
+                delattr(ds, keyword)
+        
+        return file_path, ds, pixel_array
+        
+    except Exception as e:
+        return file_path, None, str(e)
+
 
 class DICOMLoader:
     """Load DICOM files from directory."""
     
     SUPPORTED_EXTENSIONS = {'.dcm', '.dicom', '.ima', ''}
+    PARALLEL_MIN_FILES = 64  # Below this, process start-up outweighs the decode
     
     @staticmethod
     def is_dicom_file(file_path: str) -> bool:
@@ -47,20 +91,25 @@ class DICOMLoader:
             List of DICOM file paths
         """
         dicom_files = []
+        stack = [directory]
         
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                file_path = os.path.join(root, file)
-                file_ext = os.path.splitext(file)[1].lower()
-                
-                # Check extension
-                if file_ext in DICOMLoader.SUPPORTED_EXTENSIONS:
-                    # Validate DICOM magic number
-                    if DICOMLoader.is_dicom_file(file_path):
-                        dicom_files.append(file_path)
-                    elif file_ext in {'.dcm', '.dicom', '.ima'}:
-                        # Try anyway if extension suggests DICOM
-                        dicom_files.append(file_path)
+        # scandir reuses the type info from readdir, so no stat per entry
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    
+                    # Check the name before touching the file: trust DICOM
+                    # extensions, only probe extensionless files
+                    name = entry.name
+                    if name.endswith(_DCM_SUFFIXES) or name.lower().endswith(_DCM_SUFFIXES_LOWER):
+                        if entry.is_file():
+                            dicom_files.append(entry.path)
+                    elif '.' not in name.lstrip('.'):
+                        if entry.is_file() and DICOMLoader.is_dicom_file(entry.path):
+                            dicom_files.append(entry.path)
         
         logger.info(f"Found {len(dicom_files)} potential DICOM files")
         return dicom_files
@@ -81,27 +130,11 @@ class DICOMLoader:
         valid_slices = []
         failed_files = []
         
-        for file_path in file_paths:
-            try:
-                ds = pydicom.dcmread(file_path, force=True)
-                
-                # Validate has pixel data
-                if not hasattr(ds, 'pixel_array'):
-                    failed_files.append((file_path, "No pixel data"))
-                    continue
-                
-                pixel_array = ds.pixel_array
-                
-                # Validate not empty
-                if pixel_array.size == 0:
-                    failed_files.append((file_path, "Empty pixel array"))
-                    continue
-                
-                valid_slices.append((ds, file_path, pixel_array))
-                
-            except Exception as e:
-                failed_files.append((file_path, str(e)))
-                continue
+        for file_path, ds, result in DICOMLoader._load_all(file_paths):
+            if ds is None:
+                failed_files.append((file_path, result))
+            else:
+                valid_slices.append((ds, file_path, result))
         
         logger.info(f"Loaded {len(valid_slices)} valid DICOM slices")
         if failed_files:
@@ -109,6 +142,22 @@ class DICOMLoader:
         
         return valid_slices, failed_files
     
+    @staticmethod
+    def _load_all(file_paths: List[str]):
+        """Decode files in a spawn-based process pool, serially for small series."""
+        if len(file_paths) >= DICOMLoader.PARALLEL_MIN_FILES and (os.cpu_count() or 1) > 1:
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=os.cpu_count(),
+                    mp_context=multiprocessing.get_context('spawn')
+                ) as executor:
+                    return list(executor.map(_load_one, file_paths, chunksize=8))
+            except (BrokenProcessPool, AssertionError, OSError) as e:
+                # e.g. daemonic worker processes cannot spawn children
+                logger.warning(f"Parallel DICOM decode unavailable ({e}), loading serially")
+        
+        return [_load_one(file_path) for file_path in file_paths]
+    
     @staticmethod
     def sort_slices(slices: List[Tuple]) -> List[Tuple]:
         """
@@ -120,20 +169,24 @@ class DICOMLoader:
         Returns:
             Sorted list of slices
         """
-        def sort_key(slice_data):
-            ds, _, _ = slice_data
-            
-            # Try multiple sorting criteria
-            if hasattr(ds, 'SliceLocation') and ds.SliceLocation is not None:
-                return float(ds.SliceLocation)
-            elif hasattr(ds, 'ImagePositionPatient') and ds.ImagePositionPatient:
-                return float(ds.ImagePositionPatient[2])  # Z-coordinate
-            elif hasattr(ds, 'InstanceNumber') and ds.InstanceNumber is not None:
-                return int(ds.InstanceNumber)
+        def sort_key(ds):
+            # Try multiple sorting criteria (each attribute read once)
+            slice_location = getattr(ds, 'SliceLocation', None)
+            if slice_location is not None:
+                return float(slice_location)
+            position = getattr(ds, 'ImagePositionPatient', None)
+            if position:
+                return float(position[2])  # Z-coordinate
+            instance_number = getattr(ds, 'InstanceNumber', None)
+            if instance_number is not None:
+                return int(instance_number)
             return 0
         
         try:
-            return sorted(slices, key=sort_key)
+            # One key per slice up front; the sort only indexes the list
+            keys = [sort_key(ds) for ds, _, _ in slices]
+            order = sorted(range(len(slices)), key=keys.__getitem__)
+            return [slices[i] for i in order]
         except Exception as e:
             logger.warning(f"Could not sort by metadata: {e}, using filename")
             # Fallback to filename sorting
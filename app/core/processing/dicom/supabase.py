@@ -66,8 +66,8 @@ def process_dicom_to_supabase(
         # 3. Sort slices
         sorted_slices = DICOMLoader.sort_slices(valid_slices)
         
-        # 4. Create 3D volume
-        volume = DICOMVolumeCreator.create_volume(sorted_slices)
+        # 4. Create 3D volume (already normalized to uint8)
+        volume = DICOMVolumeCreator.create_normalized_volume(sorted_slices)
         
         # 5. Extract metadata
         metadata = DICOMVolumeCreator.extract_metadata(sorted_slices[0][0])
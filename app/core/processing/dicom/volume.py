@@ -7,6 +7,8 @@ import numpy as np
 from typing import List, Tuple, Dict
 import logging
 
+from ..kernels import rescale_normalize_into
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,35 +24,110 @@ class DICOMVolumeCreator:
             slices: List of (dataset, file_path, pixel_array)
             
         Returns:
-            3D numpy array (stacked along axis 2)
+            3D float32 numpy array (stacked along axis 2)
         """
-        pixel_data_list = []
+        if not slices:
+            raise ValueError("No valid pixel data to create volume")
+        
+        # Fill a preallocated float32 volume in place (no list of float64
+        # copies plus a second full-size np.stack output)
+        volume = np.empty(slices[0][2].shape + (len(slices),), dtype=np.float32)
+        count = 0
         
         for ds, file_path, pixel_array in slices:
             try:
+                out = volume[..., count]
+                
                 # Apply rescaling if available
                 if hasattr(ds, 'RescaleSlope') and hasattr(ds, 'RescaleIntercept'):
                     slope = float(ds.RescaleSlope) if ds.RescaleSlope else 1.0
                     intercept = float(ds.RescaleIntercept) if ds.RescaleIntercept else 0.0
-                    pixel_array = pixel_array.astype(np.float64) * slope + intercept
+                    np.multiply(pixel_array, slope, out=out, dtype=np.float32, casting='unsafe')
+                    out += intercept
+                else:
+                    out[...] = pixel_array
                 
-                # Ensure consistent data type
-                pixel_array = pixel_array.astype(np.float64)
-                pixel_data_list.append(pixel_array)
+                count += 1
                 
             except Exception as e:
                 logger.warning(f"Error processing slice {file_path}: {e}")
                 continue
         
-        if not pixel_data_list:
+        if count == 0:
             raise ValueError("No valid pixel data to create volume")
         
-        # Stack into 3D volume
-        volume = np.stack(pixel_data_list, axis=2)
+        if count < len(slices):
+            volume = np.ascontiguousarray(volume[..., :count])
+        
         logger.info(f"Created volume shape: {volume.shape}, dtype: {volume.dtype}")
         
         return volume
     
+    @staticmethod
+    def _rescale_params(ds) -> Tuple[float, float]:
+        """RescaleSlope/RescaleIntercept of a slice, (1.0, 0.0) when absent."""
+        if hasattr(ds, 'RescaleSlope') and hasattr(ds, 'RescaleIntercept'):
+            slope = float(ds.RescaleSlope) if ds.RescaleSlope else 1.0
+            intercept = float(ds.RescaleIntercept) if ds.RescaleIntercept else 0.0
+            return slope, intercept
+        return 1.0, 0.0
+    
+    @staticmethod
+    def create_normalized_volume(slices: List[Tuple]) -> np.ndarray:
+        """
+        Create the 0-255 uint8 volume straight from raw DICOM pixels.
+        
+        Equivalent to normalizing create_volume()'s output, but the rescale
+        and the normalization are fused per slice, so no float volume is
+        ever allocated. The global range comes from per-slice raw min/max
+        mapped through each slice's rescale.
+        
+        Args:
+            slices: List of (dataset, file_path, pixel_array)
+            
+        Returns:
+            3D uint8 numpy array (stacked along axis 2)
+        """
+        if not slices:
+            raise ValueError("No valid pixel data to create volume")
+        
+        shape = slices[0][2].shape
+        params = []
+        volume_min, volume_max = np.inf, -np.inf
+        
+        # Pass 1: rescaled range from per-slice raw extremes
+        for ds, file_path, pixel_array in slices:
+            try:
+                if pixel_array.shape != shape:
+                    raise ValueError(f"shape {pixel_array.shape} != {shape}")
+                slope, intercept = DICOMVolumeCreator._rescale_params(ds)
+                lo = float(pixel_array.min()) * slope + intercept
+                hi = float(pixel_array.max()) * slope + intercept
+                volume_min = min(volume_min, lo, hi)
+                volume_max = max(volume_max, lo, hi)
+                params.append((pixel_array, slope, intercept))
+            except Exception as e:
+                logger.warning(f"Error processing slice {file_path}: {e}")
+                continue
+        
+        if not params:
+            raise ValueError("No valid pixel data to create volume")
+        
+        volume = np.empty(shape + (len(params),), dtype=np.uint8)
+        
+        if volume_max == volume_min:
+            logger.warning("Constant intensity volume detected")
+            volume.fill(0)
+            return volume
+        
+        # Pass 2: rescale + normalize each slice directly into uint8
+        scale = 255.0 / (volume_max - volume_min)
+        for i, (pixel_array, slope, intercept) in enumerate(params):
+            rescale_normalize_into(pixel_array, slope, intercept, volume_min, scale, volume[..., i])
+        
+        logger.info(f"Created normalized volume shape: {volume.shape}, dtype: {volume.dtype}")
+        return volume
+    
     @staticmethod
     def extract_metadata(first_slice) -> Dict[str, float]:
         """
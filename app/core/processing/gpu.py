@@ -0,0 +1,147 @@
+"""
+GPU Slice Encoding
+
+Optional CuPy + nvJPEG path for large volumes: normalize, validate and
+JPEG-encode on the device and copy back only the compressed bytes.
+"""
+from functools import lru_cache
+from typing import Iterator, Optional
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENCODE_BATCH_SIZE = 64  # Slices per nvJPEG batch call
+
+_NORMALIZE_KERNEL_SOURCE = '''
+    float v = ((float)x - volume_min) * scale;
+    y = (unsigned char)(v < 0.0f ? 0.0f : (v > 255.0f ? 255.0f : v));
+'''
+
+
+@lru_cache(maxsize=1)
+def gpu_available() -> bool:
+    """
+    Check for CuPy, a CUDA device and torchvision's batched CUDA encode_jpeg (0.19+).
+    
+    Resolved lazily so importing this module never initializes CUDA
+    (workers fork after import).
+    
+    Returns:
+        True if the GPU slice path can be used
+    """
+    try:
+        import cupy
+        import torchvision
+        
+        major, minor = (int(part) for part in torchvision.__version__.split('.')[:2])
+        if (major, minor) < (0, 19):
+            return False
+        return cupy.cuda.runtime.getDeviceCount() > 0
+    except Exception:
+        return False
+
+
+@lru_cache(maxsize=1)
+def _sum_sq_kernel():
+    import cupy
+    # Squares are formed per element inside the reduction, so no
+    # volume-sized float temporary is materialized
+    return cupy.ReductionKernel(
+        'T x',
+        'float64 y',
+        '(double)x * (double)x',
+        'a + b',
+        'y = a',
+        '0',
+        'sum_of_squares'
+    )
+
+
+@lru_cache(maxsize=1)
+def _normalize_kernel():
+    import cupy
+    return cupy.ElementwiseKernel(
+        'T x, float32 volume_min, float32 scale',
+        'uint8 y',
+        _NORMALIZE_KERNEL_SOURCE,
+        'normalize_to_uint8'
+    )
+
+
+def normalize_volume_gpu(volume: np.ndarray):
+    """
+    Upload a volume and normalize it to 0-255 uint8 on the device.
+    
+    Same mapping as SliceGenerator.normalize_volume, in one elementwise
+    kernel (no float temporaries).
+    
+    Args:
+        volume: 3D numpy array
+    
+    Returns:
+        3D cupy uint8 array
+    """
+    import cupy
+    
+    volume_gpu = cupy.asarray(volume)
+    volume_min = float(volume_gpu.min())
+    volume_max = float(volume_gpu.max())
+    
+    if volume_gpu.dtype == cupy.uint8 and volume_min == 0 and volume_max == 255:
+        return volume_gpu
+    
+    if volume_max == volume_min:
+        logger.warning("Constant intensity volume detected")
+        return cupy.zeros(volume_gpu.shape, dtype=cupy.uint8)
+    
+    scale = np.float32(255.0 / (volume_max - volume_min))
+    return _normalize_kernel()(volume_gpu, np.float32(volume_min), scale)
+
+
+def iter_encoded_slices(
+    volume_gpu,
+    axis: int,
+    quality: int = 85,
+    limit: Optional[int] = None
+) -> Iterator[bytes]:
+    """
+    Yield JPEG bytes for the valid slices of one view, in slice order.
+    
+    Validity matches is_valid_slice (any content and std > 1), computed
+    for the whole view in one reduction.
+    
+    Args:
+        volume_gpu: Normalized 3D cupy uint8 array
+        axis: Axis to slice along
+        quality: JPEG quality
+        limit: Max slices to encode (None encodes all)
+    
+    Yields:
+        Encoded JPEG bytes per valid slice
+    """
+    import cupy
+    import torch
+    from torchvision.io import encode_jpeg
+    
+    view_gpu = cupy.moveaxis(volume_gpu, axis, 0)
+    # Variance from the sum and sum of squares (as the CPU kernel does);
+    # cupy's var would materialize a float64 copy of the whole view
+    n = view_gpu.shape[1] * view_gpu.shape[2]
+    totals = view_gpu.sum(axis=(1, 2), dtype=cupy.float64)
+    means = totals / n
+    variances = _sum_sq_kernel()(view_gpu, axis=(1, 2)) / n - means * means
+    valid = cupy.nonzero((totals > 0) & (variances > 1.0))[0].get()
+    if limit is not None:
+        valid = valid[:limit]
+    
+    for start in range(0, len(valid), ENCODE_BATCH_SIZE):
+        batch = [
+            torch.as_tensor(cupy.ascontiguousarray(view_gpu[int(i)])[None], device='cuda')
+            for i in valid[start:start + ENCODE_BATCH_SIZE]
+        ]
+        for encoded in encode_jpeg(batch, quality=quality):
+            yield encoded.cpu().numpy().tobytes()
+
+
+__all__ = ['gpu_available', 'normalize_volume_gpu', 'iter_encoded_slices']
@@ -4,10 +4,9 @@ NIfTI Processing
 Complete NIfTI to slices processing pipeline.
 """
 from typing import Dict, Optional, Callable
-import nibabel as nib
-import numpy as np
 import logging
 
+from .loader import NIfTILoader
 from ..base import SliceGenerator
 
 logger = logging.getLogger(__name__)
@@ -43,8 +42,7 @@ def process_nifti(
         logger.info(f"Starting NIfTI processing: {file_path}")
         
         # 1. Load NIfTI file
-        nii_img = nib.load(file_path)
-        volume = nii_img.get_fdata()
+        nii_img, volume = NIfTILoader.load(file_path)
         
         # 2. Validate data
         if volume.size == 0:
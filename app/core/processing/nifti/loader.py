@@ -0,0 +1,38 @@
+"""
+NIfTI Volume Loader
+
+Load NIfTI volumes without the float64 copy of get_fdata().
+"""
+from typing import Tuple
+import nibabel as nib
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class NIfTILoader:
+    """Load NIfTI volumes in their stored dtype."""
+    
+    @staticmethod
+    def load(file_path: str) -> Tuple[nib.Nifti1Image, np.ndarray]:
+        """
+        Load a NIfTI file and its voxel data.
+        
+        Reads through the image's dataobj proxy: scl_slope/scl_inter are
+        still applied, but unscaled data keeps its stored dtype (e.g. int16)
+        and an uncompressed .nii stays memory-mapped, paged in on demand.
+        
+        Args:
+            file_path: Path to NIfTI file (.nii or .nii.gz)
+        
+        Returns:
+            Tuple of (nifti_image, volume)
+        """
+        nii_img = nib.load(file_path, mmap=True)
+        volume = np.asanyarray(nii_img.dataobj)
+        
+        return nii_img, volume
+
+
+__all__ = ['NIfTILoader']
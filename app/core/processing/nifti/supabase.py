@@ -4,9 +4,9 @@ NIfTI Processing with Supabase Upload
 Complete NIfTI to Supabase processing pipeline.
 """
 from typing import Dict, Optional, Callable
-import nibabel as nib
 import logging
 
+from .loader import NIfTILoader
 from ..supabase_uploader import SupabaseSliceUploader
 
 logger = logging.getLogger(__name__)
@@ -52,8 +52,7 @@ def process_nifti_to_supabase(
         logger.info(f"Starting NIfTI processing with Supabase upload: {file_path}")
         
         # 1. Load NIfTI file
-        nii_img = nib.load(file_path)
-        volume = nii_img.get_fdata()
+        nii_img, volume = NIfTILoader.load(file_path)
         
         # 2. Validate data
         if volume.size == 0:
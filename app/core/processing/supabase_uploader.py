@@ -4,19 +4,57 @@ Supabase Slice Uploader
 Upload slices directly to Supabase storage without saving locally.
 """
 from typing import Dict, Optional, Callable, List
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import numpy as np
-from PIL import Image
-import io
+import httpx
 import logging
+import threading
 from flask import current_app
 
+from app.config import Config
+from .base import SliceGenerator, encode_jpeg
+from .kernels import slice_is_valid
+from . import gpu
+
 logger = logging.getLogger(__name__)
 
+# Storage ETag of a single-part upload: the object's MD5 (multipart ones end in -N)
+_MD5_RE = re.compile(r'[0-9a-f]{32}')
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# One keep-alive client per process: TLS is negotiated once, not per slice
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def _get_http_client() -> httpx.Client:
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    http2=HTTP2_AVAILABLE,
+                    timeout=60,
+                    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+                )
+    return _http_client
+
 
 class SupabaseSliceUploader:
     
     VIEWS = ['axial', 'coronal', 'sagittal']
     AXES = {'axial': 2, 'coronal': 1, 'sagittal': 0}
+    UPLOAD_WORKERS = 32  # Uploads are network-bound
+    DEBUG_SLICE_LIMIT = 5  # [DEBUG] Max slices per view; None uploads all
+    UPLOAD_RETRIES = 2  # Extra attempts per slice before its index is compacted away
+    PUBLIC_URL_PLACEHOLDER = '__storage_path__'
     
     def __init__(self, supabase_client):
         """
@@ -26,18 +64,27 @@ class SupabaseSliceUploader:
             supabase_client: Supabase client instance
         """
         self.supabase = supabase_client
+        self._public_url_parts = None
+    
+    def public_url(self, storage_path: str) -> str:
+        """
+        Public URL of an object in the reports bucket.
+        
+        supabase-py builds public URLs by plain concatenation, so build one
+        once around a placeholder and splice later paths into the same
+        prefix/suffix instead of a client call per slice.
+        """
+        if self._public_url_parts is None:
+            template = self.supabase.storage.from_('reports').get_public_url(self.PUBLIC_URL_PLACEHOLDER)
+            prefix, _, suffix = template.partition(self.PUBLIC_URL_PLACEHOLDER)
+            self._public_url_parts = (prefix, suffix)
+        prefix, suffix = self._public_url_parts
+        return f"{prefix}{storage_path}{suffix}"
     
     @staticmethod
     def normalize_volume(volume: np.ndarray) -> np.ndarray:
-        """Normalize volume to 0-255 range."""
-        volume_min, volume_max = volume.min(), volume.max()
-        
-        if volume_max == volume_min:
-            logger.warning("Constant intensity volume detected")
-            return np.zeros_like(volume, dtype=np.uint8)
-        
-        normalized = (volume - volume_min) / (volume_max - volume_min) * 255
-        return normalized.astype(np.uint8)
+        """Normalize volume to 0-255 range (single fused pass into uint8)."""
+        return SliceGenerator.normalize_volume(volume)
     
     @staticmethod
     def extract_slice(volume: np.ndarray, axis: int, index: int) -> np.ndarray:
@@ -52,15 +99,12 @@ class SupabaseSliceUploader:
     @staticmethod
     def is_valid_slice(slice_data: np.ndarray) -> bool:
         """Check if slice has meaningful content."""
-        return np.any(slice_data) and np.std(slice_data) > 1
+        return slice_is_valid(slice_data)
     
     @staticmethod
     def slice_to_bytes(slice_data: np.ndarray, quality: int = 85) -> bytes:
-
-        img = Image.fromarray(slice_data, mode='L')
-        buffer = io.BytesIO()
-        img.save(buffer, format='JPEG', quality=quality, optimize=True)
-        return buffer.getvalue()
+        """Encode slice as grayscale JPEG (libjpeg-turbo when available)."""
+        return encode_jpeg(slice_data, quality)
     
     def upload_slice(
         self,
@@ -70,29 +114,161 @@ class SupabaseSliceUploader:
         report_id: str,
         report_type: str,
         view: str,
-        index: int
+        index: int,
+        existing: Optional[Dict[str, str]] = None
     ) -> Optional[str]:
 
         try:
             # Build storage path
             storage_path = f"{clinic_id}/{patient_id}/{report_type}/{report_id}/{view}/{index}.jpg"
             
-            # Upload to Supabase
-            response = self.supabase.storage.from_('reports').upload(
-                path=storage_path,
-                file=slice_bytes,
-                file_options={"content-type": "image/jpeg"}
-            )
+            # Rerun of the same report: identical object already stored
+            if existing and existing.get(f"{index}.jpg") == hashlib.md5(slice_bytes).hexdigest():
+                return self.public_url(storage_path)
             
-            # Get public URL
-            public_url = self.supabase.storage.from_('reports').get_public_url(storage_path)
+            # Upload to Supabase over the pooled keep-alive client when we
+            # have credentials; otherwise go through supabase-py
+            if Config.SUPABASE_URL and Config.SUPABASE_KEY:
+                response = _get_http_client().post(
+                    f"{Config.SUPABASE_URL.rstrip('/')}/storage/v1/object/reports/{storage_path}",
+                    content=slice_bytes,
+                    headers={
+                        'Authorization': f"Bearer {Config.SUPABASE_KEY}",
+                        'apikey': Config.SUPABASE_KEY,
+                        'Content-Type': 'image/jpeg',
+                        'x-upsert': 'true'
+                    }
+                )
+                response.raise_for_status()
+            else:
+                self.supabase.storage.from_('reports').upload(
+                    path=storage_path,
+                    file=slice_bytes,
+                    file_options={"content-type": "image/jpeg", "x-upsert": "true"}
+                )
             
-            return public_url
+            # Get public URL
+            return self.public_url(storage_path)
             
         except Exception as e:
             logger.error(f"Failed to upload slice {view}/{index}: {e}")
             return None
     
+    def _encode_and_upload(
+        self,
+        slice_data: np.ndarray,
+        clinic_id: str,
+        patient_id: str,
+        report_id: str,
+        report_type: str,
+        view: str,
+        index: int,
+        existing: Optional[Dict[str, str]] = None
+    ) -> Optional[str]:
+        """Encode one slice and upload it (runs on the upload pool)."""
+        slice_bytes = self.slice_to_bytes(slice_data)
+        return self.upload_slice(
+            slice_bytes,
+            clinic_id,
+            patient_id,
+            report_id,
+            report_type,
+            view,
+            index,
+            existing
+        )
+    
+    def _existing_objects(self, prefix: str, limit: int) -> Dict[str, str]:
+        """
+        MD5 digests of objects already stored under a view prefix, by file name.
+        
+        One list call per view lets reruns skip slices whose stored bytes
+        are identical; any listing error just means nothing is skipped.
+        Only single-part ETags (the plain MD5 of the object) are used.
+        """
+        try:
+            objects = self.supabase.storage.from_('reports').list(prefix, {"limit": limit})
+        except Exception as e:
+            logger.warning(f"Could not list existing slices in {prefix}: {e}")
+            return {}
+        
+        existing = {}
+        for obj in objects or []:
+            etag = str((obj.get('metadata') or {}).get('eTag') or '').strip('"').lower()
+            if _MD5_RE.fullmatch(etag):
+                existing[obj['name']] = etag
+        return existing
+    
+    def _compact_view(
+        self,
+        executor: ThreadPoolExecutor,
+        task: Callable,
+        uploaded: Dict[int, tuple],
+        clinic_id: str,
+        patient_id: str,
+        report_id: str,
+        report_type: str,
+        view: str
+    ) -> List[str]:
+        """
+        Make a view's stored names contiguous after slices that never uploaded.
+        
+        Consumers read {view}/0..count-1.jpg, so every slice after a hole
+        is re-uploaded one index down. A failed move truncates the view
+        there, so the returned count never points past a missing object.
+        
+        Args:
+            uploaded: {index: (url, slice data)} of the uploaded slices
+        
+        Returns:
+            Public URLs for indices 0..len-1, in order
+        """
+        order = sorted(uploaded)
+        urls = [uploaded[index][0] for index in order]
+        moves = {
+            position: executor.submit(
+                task,
+                uploaded[index][1],
+                clinic_id,
+                patient_id,
+                report_id,
+                report_type,
+                view,
+                position,
+                None
+            )
+            for position, index in enumerate(order) if index != position
+        }
+        if not moves:
+            return urls
+        
+        logger.warning(f"⚠️ Compacting {len(moves)} {view} slices after failed uploads")
+        for position in sorted(moves):
+            url = moves[position].result()
+            if not url:
+                logger.error(f"Could not move {view} slice to index {position}, truncating the view")
+                return urls[:position]
+            urls[position] = url
+        return urls
+    
+    def _iter_valid_slices(self, view_volume: np.ndarray):
+        """Yield slices of a view-first volume that pass is_valid_slice, in order."""
+        for slice_data in view_volume:
+            if self.is_valid_slice(slice_data):
+                yield slice_data
+    
+    def _normalize_on_gpu(self, volume: np.ndarray):
+        """Normalized cupy volume when the GPU path applies, else None."""
+        if not Config.USE_GPU_SLICES or volume.size < Config.GPU_SLICE_MIN_VOXELS:
+            return None
+        if not gpu.gpu_available():
+            return None
+        try:
+            return gpu.normalize_volume_gpu(volume)
+        except Exception as e:
+            logger.warning(f"GPU normalization failed ({e}), using CPU path")
+            return None
+    
     def upload_all_slices(
         self,
         volume: np.ndarray,
@@ -102,57 +278,134 @@ class SupabaseSliceUploader:
         report_type: str,
         progress_callback: Optional[Callable] = None
     ) -> Dict:
-        volume_normalized = self.normalize_volume(volume)
+        # Large volumes: normalize, validate and encode on the GPU so only
+        # JPEG bytes cross back to the host; the pool then only uploads
+        volume_gpu = self._normalize_on_gpu(volume)
+        if volume_gpu is not None:
+            logger.info("🚀 Encoding slices on GPU (nvJPEG)")
+            volume_normalized = volume_gpu
+            task = self.upload_slice
+        else:
+            volume_normalized = self.normalize_volume(volume)
+            task = self._encode_and_upload
         slice_counts = {}
         uploaded_urls = []
         failed_count = 0
+        limit = self.DEBUG_SLICE_LIMIT
         
-        for view in self.VIEWS:
-            axis = self.AXES[view]
-            slice_count = volume_normalized.shape[axis]
-            saved_count = 0
-            
-            logger.info(f"Uploading {slice_count} {view} slices to Supabase...")
-            
-            for i in range(slice_count):
-                # Extract slice
-                slice_data = self.extract_slice(volume_normalized, axis, i)
+        # Encoding releases the GIL and uploads wait on the network, so keep
+        # up to UPLOAD_WORKERS slices in flight instead of one at a time
+        with ThreadPoolExecutor(max_workers=self.UPLOAD_WORKERS) as executor:
+            for view in self.VIEWS:
+                axis = self.AXES[view]
+                slice_count = volume_normalized.shape[axis]
+                saved_count = 0
+                next_index = 0
+                uploaded = {}
+                pending = set()
+                submitted = {}
                 
-                # Validate
-                if not self.is_valid_slice(slice_data):
-                    continue
+                view_volume = None
+                if volume_gpu is not None:
+                    # Encode the whole view up front (JPEG bytes are small) so
+                    # a GPU failure can still fall back before anything is sent;
+                    # no limit, so failed debug uploads can be topped up
+                    try:
+                        valid_slices = iter(list(gpu.iter_encoded_slices(volume_gpu, axis)))
+                    except Exception as e:
+                        logger.warning(f"GPU slice encoding failed for {view} ({e}), using CPU path")
+                        volume_gpu = None
+                        volume_normalized = self.normalize_volume(volume)
+                        task = self._encode_and_upload
+                if volume_gpu is None:
+                    # One C-contiguous copy per view (none for axis 0) so each
+                    # slice is a sequential row-major buffer for the encoder;
+                    # not worth it when only a handful of debug slices are sent
+                    view_volume = np.moveaxis(volume_normalized, axis, 0)
+                    if limit is None:
+                        view_volume = np.ascontiguousarray(view_volume)
+                    valid_slices = self._iter_valid_slices(view_volume)
+                exhausted = False
                 
-                # Convert to JPEG bytes
-                slice_bytes = self.slice_to_bytes(slice_data)
-                
-                # Upload to Supabase
-                url = self.upload_slice(
-                    slice_bytes,
-                    clinic_id,
-                    patient_id,
-                    report_id,
-                    report_type,
-                    view,
-                    saved_count
+                existing = self._existing_objects(
+                    f"{clinic_id}/{patient_id}/{report_type}/{report_id}/{view}",
+                    max(slice_count, 1)
                 )
+                if existing:
+                    logger.info(f"♻️ {len(existing)} {view} slices already in storage, unchanged ones will be skipped")
+                
+                logger.info(f"Uploading {slice_count} {view} slices to Supabase...")
                 
-                if url:
-                    uploaded_urls.append(url)
-                    saved_count += 1
+                while True:
+                    # Top up the window, never queueing past the debug limit
+                    while (not exhausted and len(pending) < self.UPLOAD_WORKERS
+                           and (limit is None or saved_count + len(pending) < limit)):
+                        slice_data = next(valid_slices, None)
+                        if slice_data is None:
+                            exhausted = True
+                            break
+                        future = executor.submit(
+                            task,
+                            slice_data,
+                            clinic_id,
+                            patient_id,
+                            report_id,
+                            report_type,
+                            view,
+                            next_index,
+                            existing
+                        )
+                        pending.add(future)
+                        submitted[future] = (next_index, slice_data, 0)
+                        next_index += 1
                     
-                    # [DEBUG] Limit to 5 slices per view as requested
-                    if saved_count >= 5:
-                        logger.info(f"🛑 Reached limit of 5 slices for {view} (Debug Mode)")
+                    if not pending:
                         break
-                else:
-                    failed_count += 1
+                    
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index, slice_data, attempt = submitted.pop(future)
+                        url = future.result()
+                        if url:
+                            uploaded[index] = (url, slice_data)
+                            saved_count += 1
+                            
+                            # Progress callback
+                            if progress_callback and saved_count % 20 == 0:
+                                progress_callback(view, saved_count, slice_count)
+                        elif attempt < self.UPLOAD_RETRIES:
+                            # Retry under the same index so names stay contiguous
+                            retry = executor.submit(
+                                task,
+                                slice_data,
+                                clinic_id,
+                                patient_id,
+                                report_id,
+                                report_type,
+                                view,
+                                index,
+                                existing
+                            )
+                            pending.add(retry)
+                            submitted[retry] = (index, slice_data, attempt + 1)
+                        else:
+                            failed_count += 1
                 
-                # Progress callback
-                if progress_callback and i % 20 == 0:
-                    progress_callback(view, i, slice_count)
-            
-            slice_counts[view] = saved_count
-            logger.info(f"✅ Uploaded {saved_count} {view} slices to Supabase")
+                # [DEBUG] Limit to 5 slices per view as requested
+                if limit is not None and saved_count >= limit:
+                    logger.info(f"🛑 Reached limit of {limit} slices for {view} (Debug Mode)")
+                
+                view_urls = self._compact_view(
+                    executor, task, uploaded,
+                    clinic_id, patient_id, report_id, report_type, view
+                )
+                saved_count = len(view_urls)
+                
+                valid_slices = view_volume = uploaded = None  # Release before the next view copy
+                
+                uploaded_urls.extend(view_urls)
+                slice_counts[view] = saved_count
+                logger.info(f"✅ Uploaded {saved_count} {view} slices to Supabase")
         
         result = {
             'slice_counts': slice_counts,
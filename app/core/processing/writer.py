@@ -0,0 +1,181 @@
+"""
+Slice File Writer
+
+Batched file writes through io_uring (Linux 5.1+) with a synchronous fallback.
+"""
+import os
+import sys
+import queue
+import threading
+import logging
+
+from app.config import Config
+
+try:
+    import liburing
+    LIBURING_AVAILABLE = True
+except ImportError:
+    liburing = None
+    LIBURING_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+
+
+def _write_all(fd: int, data: bytes, offset: int = 0) -> None:
+    """Synchronously write data[offset:] at its file offset, looping on short writes."""
+    view = memoryview(data)[offset:]
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+class UringWriteEngine:
+    """Submit queued (fd, bytes) writes to io_uring in batches from a daemon thread."""
+    
+    BATCH_SIZE = 64
+    MAX_QUEUED = BATCH_SIZE * 4  # Bounds open fds: submit() blocks past this
+    
+    def __init__(self):
+        self._ring = liburing.io_uring()
+        liburing.io_uring_queue_init(self.BATCH_SIZE, self._ring, 0)
+        self._queue = queue.Queue(maxsize=self.MAX_QUEUED)
+        self._errors = []
+        self._errors_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='uring-writer', daemon=True)
+        self._thread.start()
+    
+    def submit(self, fd: int, data: bytes, path: str = '') -> None:
+        """Queue a full-file write; the engine closes fd once it completes."""
+        self._queue.put((fd, data, path))
+    
+    def flush(self) -> None:
+        """
+        Block until every queued write has completed.
+        
+        Raises:
+            OSError: If any write since the last flush failed
+        """
+        self._queue.join()
+        with self._errors_lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            path, message = errors[0]
+            raise OSError(f"{len(errors)} slice writes failed (first: {path}: {message})")
+    
+    def _fail(self, path: str, message: str) -> None:
+        logger.error(f"io_uring write failed for {path}: {message}")
+        with self._errors_lock:
+            self._errors.append((path, message))
+    
+    def _run(self):
+        cqe = liburing.io_uring_cqe()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            completed = set()
+            try:
+                for i, (fd, data, _) in enumerate(batch):
+                    sqe = liburing.io_uring_get_sqe(self._ring)
+                    liburing.io_uring_prep_write(sqe, fd, data, len(data), 0)
+                    liburing.io_uring_sqe_set_data64(sqe, i)
+                liburing.io_uring_submit(self._ring)
+                
+                # Completions may arrive out of order; user_data maps them back
+                for _ in batch:
+                    liburing.io_uring_wait_cqe(self._ring, cqe)
+                    res = cqe.res
+                    i = liburing.io_uring_cqe_get_data64(cqe)
+                    liburing.io_uring_cqe_seen(self._ring, cqe)
+                    completed.add(i)
+                    fd, data, path = batch[i]
+                    
+                    if res < 0:
+                        self._fail(path, os.strerror(-res))
+                    elif res < len(data):
+                        logger.warning(f"io_uring short write ({res}/{len(data)} bytes), finishing synchronously")
+                        try:
+                            _write_all(fd, data, res)
+                        except OSError as e:
+                            self._fail(path, str(e))
+            except Exception as e:
+                for i, (_, _, path) in enumerate(batch):
+                    if i not in completed:
+                        self._fail(path, f"io_uring batch failed: {e}")
+            finally:
+                for fd, _, _ in batch:
+                    os.close(fd)
+                    self._queue.task_done()
+
+
+_engine = None
+_engine_checked = False
+_engine_lock = threading.Lock()
+
+
+def get_write_engine():
+    """
+    Get the shared io_uring engine.
+    
+    Returns:
+        UringWriteEngine, or None when disabled or unsupported
+    """
+    global _engine, _engine_checked
+    
+    if _engine_checked:
+        return _engine
+    
+    with _engine_lock:
+        if not _engine_checked:
+            if Config.USE_IO_URING and LIBURING_AVAILABLE and sys.platform.startswith('linux'):
+                try:
+                    _engine = UringWriteEngine()
+                    logger.info("✅ io_uring write engine started")
+                except Exception as e:
+                    logger.warning(f"io_uring unavailable, using synchronous writes: {e}")
+                    _engine = None
+            _engine_checked = True
+    
+    return _engine
+
+
+def write_file(path: str, data: bytes) -> None:
+    """
+    Write bytes to path, asynchronously through io_uring when enabled.
+    
+    Args:
+        path: Destination file path
+        data: File contents
+    """
+    engine = get_write_engine()
+    fd = os.open(path, WRITE_FLAGS, 0o644)
+    
+    if engine is not None:
+        engine.submit(fd, data, path)
+        return
+    
+    try:
+        _write_all(fd, data)
+    finally:
+        os.close(fd)
+
+
+def flush_writes() -> None:
+    """
+    Wait for pending io_uring writes (no-op for synchronous writes).
+    
+    Raises:
+        OSError: If a queued write failed, as the synchronous path would
+    """
+    if _engine is not None:
+        _engine.flush()
+
+
+__all__ = ['UringWriteEngine', 'get_write_engine', 'write_file', 'flush_writes']
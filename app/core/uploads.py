@@ -3,13 +3,19 @@ Supabase Uploader for Reports
 
 Fonctions pour uploader les rapports vers Supabase Storage
 """
-import json
+import orjson
 import logging
 from typing import Dict
+from app.config import Config
 from app.services.uploads import SupabaseUploadManager
 
 logger = logging.getLogger(__name__)
 
+# Reports are machine-consumed: compact by default, indented only for debugging
+REPORT_JSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+if Config.DEBUG_PRETTY_JSON:
+    REPORT_JSON_OPTIONS |= orjson.OPT_INDENT_2
+
 
 def upload_report_json(
     report: Dict,
@@ -34,9 +40,8 @@ def upload_report_json(
         dict: Résultat de l'upload avec public_url
     """
     try:
-        # Convertir en JSON
-        report_json = json.dumps(report, indent=2, ensure_ascii=False)
-        report_bytes = report_json.encode('utf-8')
+        # Convertir en JSON (orjson renvoie directement des bytes UTF-8)
+        report_bytes = orjson.dumps(report, option=REPORT_JSON_OPTIONS)
         
         # Uploader
         uploader = SupabaseUploadManager(task_id=task_id)
@@ -6,9 +6,12 @@ Stage 2: ROI Extraction (Cropping with Padding)
 Stage 3: Problem Detection (Custom Models on Crops)
 """
 import os
+import re
 import logging
 import numpy as np
 import nibabel as nib
+from scipy import ndimage
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Tuple
 
 # Fix for PyTorch 2.6
@@ -16,11 +19,16 @@ os.environ["TORCH_SERIALIZATION_WEIGHTS_ONLY"] = "0"
 
 logger = logging.getLogger(__name__)
 
+TOTALSEG_TASK = os.getenv('CBCT_TOTALSEG_TASK', 'total') # Same task the CLI ran by default
+_TOOTH_RE = re.compile(r'tooth_(\d+)')
+
 class CBCTAIAnalyzer:
     """
     Hybrid 3-Stage Pipeline for CBCT Analysis.
     """
     
+    CROP_SHAPE = (96, 96, 96) # Canonical (D, H, W) detector input
+    
     def __init__(self, segmentation_config: Dict = None, detection_config: List[Dict] = None):
         self.detection_config = detection_config or []
         self.problem_detectors = {}
@@ -69,41 +77,35 @@ class CBCTAIAnalyzer:
             logger.info("🧠 Stage 1: Running TotalSegmentator (Segmentation & Numbering)...")
             teeth_segments, nifti_img, mask_data = self._run_totalsegmentator(volume_path)
             logger.info(f"✅ Stage 1 Complete: Found {len(teeth_segments)} teeth.")
-
-            # --- STAGE 2 & 3: Crop & Detect ---
-            logger.info("🔍 Stage 2 & 3: Extraction & Problem Detection...")
-            findings = self._detect_problems(teeth_segments, nifti_img, mask_data)
             
-            # --- STAGE 4: Synthetic Pano Generation ---
-            pano_path = None
-            try:
-                from app.domains.pano.projection import generate_synthetic_pano
-                
-                # Create output filename
-                base_name = os.path.splitext(os.path.basename(volume_path))[0]
-                # Handle .nii.gz double extension
-                if base_name.endswith('.nii'):
-                    base_name = os.path.splitext(base_name)[0]
-                    
-                output_dir = os.path.dirname(volume_path).replace('uploads', 'processed') # Save to processed
-                if not os.path.exists(output_dir):
-                    os.makedirs(output_dir)
+            findings = []
+            pano_bytes = pano_debug_bytes = None
+            
+            # No teeth: nothing to crop or project, so the volume is never decoded
+            if teeth_segments:
+                # Decode the voxels once (float32), shared by the crops and the pano
+                volume_array = np.asarray(nifti_img.dataobj, dtype=np.float32)
+
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    # --- STAGE 4: Synthetic Pano Generation ---
+                    # Only needs Stage 1 output, so it runs in the background
+                    # while Stages 2 & 3 run here
+                    pano_future = executor.submit(self._generate_pano, volume_array, teeth_segments)
+
+                    # --- STAGE 2 & 3: Crop & Detect ---
+                    # Skipped outright with no detectors configured (the default)
+                    if self.problem_detectors:
+                        logger.info("🔍 Stage 2 & 3: Extraction & Problem Detection...")
+                        findings = self._detect_problems(teeth_segments, volume_array, mask_data)
                     
-                pano_path = os.path.join(output_dir, f"{base_name}_syn_pano.jpg")
-                
-                logger.info("🖼️ Generating Synthetic Panoramic View...")
-                if generate_synthetic_pano(nifti_img.get_fdata(), teeth_segments, pano_path):
-                    logger.info(f"✅ Pano generated: {pano_path}")
-                else:
-                    pano_path = None
-            except Exception as e:
-                logger.error(f"⚠️ Failed to generate pano: {e}")
+                    pano_bytes, pano_debug_bytes = pano_future.result()
             
             return {
                 'total_teeth': len(teeth_segments),
                 'teeth_data': teeth_segments,
                 'findings': findings,
-                'pano_image': pano_path,
+                'pano_bytes': pano_bytes,
+                'pano_debug_bytes': pano_debug_bytes,
                 'summary': self._generate_summary(findings),
                 'dimensions': nifti_img.shape # (x, y, z) usually for NIfTI object, checked below
             }
@@ -113,21 +115,34 @@ class CBCTAIAnalyzer:
             # Return empty structure on failure to prevent crash
             return {'total_teeth': 0, 'teeth_data': [], 'findings': [], 'summary': {}}
 
+    def _generate_pano(self, volume_array, teeth_segments):
+        """Stage 4: synthetic panoramic JPEG (and debug view) bytes, or (None, None)."""
+        try:
+            from app.domains.pano.projection import encode_synthetic_pano
+            
+            logger.info("🖼️ Generating Synthetic Panoramic View...")
+            return encode_synthetic_pano(volume_array, teeth_segments)
+        except Exception as e:
+            logger.error(f"⚠️ Failed to generate pano: {e}")
+            return None, None
+
     def _run_totalsegmentator(self, volume_path: str) -> Tuple[List[Dict], Any, np.ndarray]:
         """
         Runs TotalSegmentator to get teeth masks.
         """
         # Check if TotalSegmentator is installed via CLI check (optional) or just run it
         
-        # Load input NIfTI
-        nifti_img = nib.load(volume_path)
+        # Load input NIfTI (memory-mapped when uncompressed: pages are read
+        # as they are touched; gzip streams cannot be mapped)
+        nifti_img = nib.load(volume_path, mmap=not volume_path.endswith('.gz'))
         
         # Check resolution and downsample if necessary
         zooms = nifti_img.header.get_zooms()
         min_zoom = min(zooms[:3])
         logger.info(f"   ℹ️ Input resolution: {zooms} (min: {min_zoom:.2f}mm)")
         
-        path_to_process = volume_path
+        # TotalSegmentator input: the file path, or the resampled image itself
+        ts_input = volume_path
         
         # If resolution is too high (e.g. < 1.0mm), downsample to 1.5mm
         # This prevents CPU timeout (15m+) on high-res CBCTs (0.25mm)
@@ -137,146 +152,95 @@ class CBCTAIAnalyzer:
         if min_zoom < 1.0 and not force_full_res:
             logger.info("   ⚠️ High resolution detected. Downsampling to 1.5mm for processing...")
             try:
-                import nibabel.processing
                 # Resample to 1.5mm isotropic
-                resampled_img = nibabel.processing.resample_to_output(nifti_img, (1.5, 1.5, 1.5))
+                resampled_img = self._resample_isotropic(nifti_img, 1.5)
                 nifti_img = resampled_img # Update valid NIfTI object
                 
-                # Save to temp file for TotalSegmentator
-                import tempfile
-                # We need a persistent temp file for the duration of the function, 
-                # but we are already inside a temp dir block below? NO.
-                # Use the 'temp_dir' we are about to create.
+                # Handed to TotalSegmentator in memory (no temp .nii.gz round-trip)
+                ts_input = resampled_img
             except Exception as e:
                 logger.error(f"Downsampling failed: {e}. Proceeding with original (risk of timeout).")
-                path_to_process = volume_path
+                ts_input = volume_path
 
-        logger.info("   ⏳ Calling TotalSegmentator CLI (this may take time)...")
+        logger.info("   ⏳ Calling TotalSegmentator (this may take time)...")
         # Run inference using a temporary directory for output
         import tempfile
-        import subprocess
         
         with tempfile.TemporaryDirectory() as temp_dir:
-            # If we resampled, save it here
-            if path_to_process != volume_path or min_zoom < 1.0: # Check condition again or use flag
-                 # If we have a new nifti_img object that is different from load?
-                 # Better logic:
-                 if min_zoom < 1.0 and 'resampled_img' in locals():
-                     temp_input_path = os.path.join(temp_dir, 'input_resampled.nii.gz')
-                     nib.save(nifti_img, temp_input_path)
-                     path_to_process = temp_input_path
-                     logger.info(f"   💾 Saved resampled volume to {temp_input_path}")
-
-            temp_output_path = os.path.join(temp_dir, 'segmentation')
-            if not os.path.exists(temp_output_path):
-                os.makedirs(temp_output_path)
+            # Single multi-label map (ml=True) instead of one file per structure.
+            # The old CLI call dropped --ml because --ml treats -o as a single
+            # file, not the directory the per-file walk read. Here the output
+            # is an explicit file path and the API also
+            # returns the map in memory: one image whose voxel values are the
+            # class_map[TOTALSEG_TASK] ids, which is what the LUT below indexes.
+            temp_output_path = os.path.join(temp_dir, 'segmentation.nii.gz')
             
             logger.info(f"   ⏳ Calling TotalSegmentator (output: {temp_output_path})...")
             
-            # Construct command
-            # TotalSegmentator -i input -o output
-            # Removed --fast (too low res for teeth) and --ml (single file output issue)
-            cmd = [
-                "TotalSegmentator",
-                "-i", path_to_process,
-                "-o", temp_output_path
-            ]
-            
             try:
-                # Run CLI command
-                logger.info(f"   💻 Executing: {' '.join(cmd)}")
-                result = subprocess.run(
-                    cmd, 
-                    check=True, 
-                    capture_output=True, 
-                    text=True,
-                    timeout=900 # 15 minutes timeout (CPU safe)
+                # In-process Python API: no new interpreter / torch import per volume
+                from totalsegmentator.python_api import totalsegmentator
+                seg_img = totalsegmentator(
+                    input=ts_input,
+                    output=temp_output_path,
+                    ml=True,
+                    task=TOTALSEG_TASK,
+                    quiet=True
                 )
-                logger.info(f"TotalSegmentator Output: {result.stdout}")
-                if result.stderr:
-                    logger.warning(f"TotalSegmentator Stderr: {result.stderr}")
-            except subprocess.CalledProcessError as e:
-                logger.error(f"TotalSegmentator CLI failed: {e.stderr}")
-                raise RuntimeError(f"TotalSegmentator failed: {e.stderr}")
             except Exception as e:
                 logger.error(f"TotalSegmentator Execution failed: {e}")
-                raise
+                raise RuntimeError(f"TotalSegmentator failed: {e}") from e
 
-            # Check for output
-            # TotalSegmentator produces a directory of files when no file name is specified (or always with -o dir)
-            # We expect multiple files like 'tooth_1.nii.gz', 'tooth_2.nii.gz' etc. or a single file if we pointed to a file.
-            # Here temp_output_path is a directory.
+            if seg_img is None and os.path.exists(temp_output_path):
+                seg_img = nib.load(temp_output_path)
             
-            generated_files = []
-            if os.path.isdir(temp_output_path):
-                # Recursive search for .nii.gz files
-                for root, dirs, files in os.walk(temp_output_path):
-                    for file in files:
-                        if file.endswith('.nii.gz'):
-                            generated_files.append(os.path.join(root, file))
-            
-            if not generated_files:
-                 # Debug: List what IS there
-                 all_files = []
-                 for root, dirs, files in os.walk(temp_output_path):
-                     for file in files:
-                         all_files.append(os.path.join(root, file))
-                 logger.error(f"DEBUG: All files in temp dir: {all_files}")
-                 # raise FileNotFoundError(f"TotalSegmentator did not produce any output files in {temp_output_path}")
-                 logger.warning("⚠️ TotalSegmentator produced no output files. Returning empty results.")
+            if seg_img is None:
+                 logger.warning("⚠️ TotalSegmentator produced no output. Returning empty results.")
                  return [], nifti_img, np.zeros(nifti_img.shape, dtype=np.uint8)
+            
+            # A multi-label map covers the input grid in one 3D volume; anything
+            # else (e.g. a per-class stack) would be mislabeled by the LUT
+            if seg_img.ndim != 3 or seg_img.shape != nifti_img.shape[:3]:
+                raise RuntimeError(
+                    f"Unexpected TotalSegmentator output shape {seg_img.shape}, expected {nifti_img.shape[:3]}"
+                )
 
-            logger.info(f"   📂 processing {len(generated_files)} output files...")
+            # Map TotalSegmentator class ids to our label ids with one lookup
+            # table pass over the volume
+            from totalsegmentator.map_to_binary import class_map
+            class_names = class_map[TOTALSEG_TASK]
             
-            # Combine all masks into one
-            # Load the first one to get dimensions
-            first_seg = nib.load(os.path.join(temp_output_path, generated_files[0]))
-            mask_data = np.zeros(first_seg.shape, dtype=np.uint8)
+            # Let's filter for teeth only?
+            teeth_classes = {ts_id: name for ts_id, name in class_names.items() if 'tooth' in name}
             
-            # Map of organ name to ID (if using standard TS labels, we might need a map)
-            # For simplicity, if filename contains 'tooth', we treat it as tooth.
-            # Or we just assign unique IDs based on file index if we trust the filenames.
+            if not teeth_classes:
+                logger.warning("No specific 'tooth' classes found. Using all segments.")
+                teeth_classes = class_names
             
-            # Let's filter for teeth only?
-            # Teeth files are usually named tooth_1.nii.gz, etc.
-            teeth_files = [f for f in generated_files if 'tooth' in f]
+            # Sized to cover every class id so mode='clip' never aliases one
+            lut = np.zeros(max(256, max(class_names) + 1), dtype=np.uint8)
+            for ts_id, name in teeth_classes.items():
+                lut[ts_id] = self._label_id(name)
             
-            if not teeth_files:
-                logger.warning("No specific 'tooth' files found. Using all segments.")
-                teeth_files = generated_files
-                
-            for f in teeth_files:
-                # Extract simple ID or just use increment
-                # tooth_1.nii.gz -> 1
-                try:
-                    # Attempt to extract number from filename (e.g. tooth_1.nii.gz)
-                    import re
-                    match = re.search(r'tooth_(\d+)', f)
-                    if match:
-                        label_id = int(match.group(1))
-                    else:
-                        # Fallback: Hash or arbitrary ID? 
-                        # Ideally we want FDI notation if TS provides it.
-                        label_id = abs(hash(f)) % 255 + 1
-                except:
-                    label_id = 1
-                
-                seg = nib.load(os.path.join(temp_output_path, f))
-                data = seg.get_fdata()
-                mask_data[data > 0] = label_id
+            mask_data = np.take(lut, np.asanyarray(seg_img.dataobj), mode='clip')
+            logger.info(f"   📂 Mapped {len(teeth_classes)} TotalSegmentator classes")
             
             # nifti_img is already set to the one we used (original or resampled)
             # Do NOT reload from volume_path here!
             # nifti_img = nib.load(volume_path) <--- DELETED
 
         # Parse mask into segments
-        unique_labels = np.unique(mask_data)
-        unique_labels = unique_labels[unique_labels > 0] # Exclude background
+        # One C-level sweep gives the extent of every label (index = label - 1,
+        # None where absent), instead of a full-volume scan per tooth
+        label_slices = ndimage.find_objects(mask_data)
+        present = [(index + 1, slices) for index, slices in enumerate(label_slices) if slices is not None]
+        
+        # Calculate all BBoxes at once (one (N, 6) array, padded/clamped vectorized)
+        bboxes = self._get_bboxes([slices for _, slices in present], mask_data.shape)
         
         segments = []
-        for label_id in unique_labels:
-            # Calculate BBox
-            bbox = self._get_bbox(mask_data, label_id)
+        for (label_id, _), bbox in zip(present, bboxes.tolist()):
+            bbox = tuple(bbox)
             
             fdi_number = str(int(label_id)) 
             
@@ -292,71 +256,196 @@ class CBCTAIAnalyzer:
             
         return segments, nifti_img, mask_data
 
-    def _get_bbox(self, mask_data, label_id, padding=5):
-        """Calculates 3D BBox with padding."""
-        coords = np.argwhere(mask_data == label_id)
-        if coords.size == 0:
-            return (0,0,0,0,0,0)
-            
-        z, y, x = coords.T # argwhere returns (z,y,x) for Nifti usually
+    def _resample_isotropic(self, nifti_img, voxel_size):
+        """
+        Linear zoom to isotropic voxels, keeping the image orientation.
+        
+        A separable zoom is a much tighter loop than the general affine
+        resample; runs on the GPU (cupyx) when one is available.
+        """
+        data = np.asanyarray(nifti_img.dataobj)
+        zooms = nifti_img.header.get_zooms()[:3]
+        factors = tuple(float(z) / voxel_size for z in zooms)
+        
+        try:
+            import cupy
+            from cupyx.scipy import ndimage as cupy_ndimage
+            resampled = cupy.asnumpy(cupy_ndimage.zoom(cupy.asarray(data), factors, order=1))
+        except Exception:
+            resampled = ndimage.zoom(data, factors, order=1, prefilter=False)
+        
+        # zoom maps first/last voxel centers onto each other
+        scales = [
+            (n_in - 1) / (n_out - 1) if n_out > 1 else 1.0
+            for n_in, n_out in zip(data.shape[:3], resampled.shape[:3])
+        ]
+        affine = nifti_img.affine @ np.diag(scales + [1.0])
+        return nib.Nifti1Image(resampled, affine)
+
+    def _label_id(self, name):
+        """Label id for a segment name: tooth_1 -> 1, otherwise an arbitrary id."""
+        # Extract simple ID or just use increment
+        try:
+            # Attempt to extract number from name (e.g. tooth_1)
+            match = _TOOTH_RE.search(name)
+            if match:
+                return int(match.group(1))
+            # Fallback: Hash or arbitrary ID? 
+            # Ideally we want FDI notation if TS provides it.
+            return abs(hash(name)) % 255 + 1
+        except:
+            return 1
+
+    def _get_bboxes(self, label_slices, shape, padding=5):
+        """
+        Calculates padded 3D BBoxes for find_objects slice tuples.
+        
+        Returns:
+            int array (N, 6) of (min_x, max_x, min_y, max_y, min_z, max_z)
+        """
+        if not label_slices:
+            return np.zeros((0, 6), dtype=np.int64)
+        
+        # (z,y,x) axis order, as for Nifti arrays usually; reorder to x, y, z
+        # Slice stops are exclusive: last index = stop - 1
+        bboxes = np.array(
+            [(x.start, x.stop - 1, y.start, y.stop - 1, z.start, z.stop - 1) for z, y, x in label_slices],
+            dtype=np.int64
+        )
         
         # Min/Max with padding
         # Clamp to array dimensions
-        d, h, w = mask_data.shape
+        d, h, w = shape
+        bboxes[:, 0::2] = np.maximum(bboxes[:, 0::2] - padding, 0)
+        bboxes[:, 1::2] = np.minimum(bboxes[:, 1::2] + padding, (w, h, d))
+        
+        return bboxes
+
+    def _crop(self, volume_data, bbox):
+        """Float32 crop of one tooth bbox (x/y/z min/max)."""
+        min_x, max_x, min_y, max_y, min_z, max_z = bbox
+        
+        # Numpy is (z, y, x) usually in Nibabel wrapper
+        return np.asarray(volume_data[min_z:max_z, min_y:max_y, min_x:max_x], dtype=np.float32)
+
+    def _resize_crop(self, volume_data, tooth):
+        """Crop one tooth and resize it to CROP_SHAPE; None for an empty bbox."""
+        import torch
+        import torch.nn.functional as F
+        
+        tooth_crop = self._crop(volume_data, tooth['bbox_3d'])
+        if tooth_crop.size == 0:
+            return None
+        
+        # Apply mask to crop (optional: to remove background bone)
+        # mask_crop = mask_data[min_z:max_z, min_y:max_y, min_x:max_x]
+        # tooth_crop = tooth_crop * (mask_crop == tooth['class_id'])
+        
+        tensor = torch.from_numpy(np.ascontiguousarray(tooth_crop))[None, None]
+        return F.interpolate(tensor, size=self.CROP_SHAPE, mode='trilinear', align_corners=False)[0]
+
+    def _batch_crops(self, segments, volume_data):
+        """
+        Resize every tooth crop to CROP_SHAPE and stack them into one batch.
+        
+        Returns:
+            (batch, valid): float32 tensor (N, 1, D, H, W) on the inference
+            device, and per-tooth flags (False where the bbox is empty)
+        """
+        import torch
+        
+        # Crops are independent and the reads/interpolation release the GIL,
+        # so prepare them on a thread pool (no copy of the volume per worker)
+        workers = max(1, min(len(segments), os.cpu_count() or 1))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            resized = list(executor.map(lambda tooth: self._resize_crop(volume_data, tooth), segments))
         
-        min_z = max(0, z.min() - padding)
-        max_z = min(d, z.max() + padding)
+        batch = torch.zeros((len(segments), 1) + self.CROP_SHAPE, dtype=torch.float32)
+        valid = []
         
-        min_y = max(0, y.min() - padding)
-        max_y = min(h, y.max() + padding)
+        for i, tensor in enumerate(resized):
+            if tensor is None:
+                valid.append(False)
+                continue
+            batch[i] = tensor
+            valid.append(True)
         
-        min_x = max(0, x.min() - padding)
-        max_x = min(w, x.max() + padding)
+        # One host-to-device copy for the whole batch
+        if torch.cuda.is_available():
+            batch = batch.pin_memory().to('cuda', non_blocking=True)
+        return batch, valid
+
+    def _predict(self, detector, segments, volume_data) -> List[float]:
+        """One batched forward for all teeth; returns a probability per tooth."""
+        import torch
+        
+        batch, valid = self._batch_crops(segments, volume_data)
+        model = self._prepare_model(detector, batch.device)
+        
+        # Half precision: FP16 tensor cores on GPU, bf16 autocast on CPU
+        if batch.device.type == 'cuda':
+            batch = batch.to(dtype=torch.float16, memory_format=torch.channels_last_3d)
+            autocast = torch.autocast('cuda', dtype=torch.float16)
+        else:
+            autocast = torch.autocast('cpu', dtype=torch.bfloat16)
+        
+        with torch.inference_mode(), autocast:
+            probs = torch.sigmoid(model(batch).float()).reshape(len(segments), -1)[:, 0]
+        return [p if ok else 0.0 for p, ok in zip(probs.cpu().tolist(), valid)]
+
+    def _prepare_model(self, detector, device):
+        """Move a detector model to the device once (FP16, channels-last on GPU)."""
+        import torch
         
-        return (int(min_x), int(max_x), int(min_y), int(max_y), int(min_z), int(max_z))
+        model = detector['model']
+        if detector.get('device') != device.type and hasattr(model, 'to'):
+            model.eval()
+            if device.type == 'cuda':
+                model = model.to(device, memory_format=torch.channels_last_3d).half()
+            else:
+                model = model.to(device)
+            detector['model'] = model
+            detector['device'] = device.type
+        return model
 
-    def _detect_problems(self, segments, nifti_img, mask_data) -> List[Dict]:
+    def _detect_problems(self, segments, volume_data, mask_data) -> List[Dict]:
         """
         Stage 2 & 3: Crop and Run Detection.
         """
         findings = []
-        volume_data = nifti_img.get_fdata()
+        if not segments or not self.problem_detectors:
+            return findings
         
-        for tooth in segments:
-            # skip if not tooth
-            
-            # 1. Crop
-            min_x, max_x, min_y, max_y, min_z, max_z = tooth['bbox_3d']
-            
-            # Numpy is (z, y, x) usually in Nibabel wrapper
-            tooth_crop = volume_data[min_z:max_z, min_y:max_y, min_x:max_x]
-            
-            # Apply mask to crop (optional: to remove background bone)
-            # mask_crop = mask_data[min_z:max_z, min_y:max_y, min_x:max_x]
-            # tooth_crop = tooth_crop * (mask_crop == tooth['class_id'])
-            
-            # 2. Run Detectors
-            for name, detector in self.problem_detectors.items():
-                try:
-                    # Mock Prediction
-                    # prob = detector['model'].predict(tooth_crop)
-                    prob = 0.0 # Default
-                    
-                    # SIMULATION for demo
-                    import random
-                    if random.random() > 0.8:
-                        prob = 0.95
-                        
-                    if prob > detector['threshold']:
-                        findings.append({
-                            'tooth_detection_id': tooth['detection_id'],
-                            'tooth_number': tooth['tooth_number'],
-                            'problem': name,
-                            'confidence': prob,
-                            'severity': 'high' if prob > 0.8 else 'moderate'
-                        })
-                except Exception as e:
-                    logger.error(f"Detection failed for {name} on {tooth['tooth_number']}: {e}")
+        names = list(self.problem_detectors)
+        detectors = list(self.problem_detectors.values())
+        
+        # Mock models: SIMULATION for demo, drawn for every tooth x detector at once
+        probs = np.where(np.random.random((len(segments), len(detectors))) > 0.8, 0.95, 0.0)
+        
+        # 1. Run Detectors: one batched forward per detector, not per tooth
+        for j, (name, detector) in enumerate(zip(names, detectors)):
+            try:
+                if callable(detector['model']):
+                    probs[:, j] = self._predict(detector, segments, volume_data)
+            except Exception as e:
+                logger.error(f"Detection failed for {name}: {e}")
+                probs[:, j] = np.nan # Never above threshold
+        
+        # 2. Collect findings: threshold every tooth x detector in one comparison,
+        # then build dicts only for the hits (row-major = tooth order, as before)
+        thresholds = np.array([detector['threshold'] for detector in detectors], dtype=np.float64)
+        hit_teeth, hit_detectors = np.nonzero(probs > thresholds[None, :])
+        
+        for i, j in zip(hit_teeth.tolist(), hit_detectors.tolist()):
+            tooth = segments[i]
+            prob = float(probs[i, j])
+            findings.append({
+                'tooth_detection_id': tooth['detection_id'],
+                'tooth_number': tooth['tooth_number'],
+                'problem': names[j],
+                'confidence': prob,
+                'severity': 'high' if prob > 0.8 else 'moderate'
+            })
                     
         return findings
 
@@ -5,6 +5,9 @@ Configuration for CBCT AI Models
 - Stage 1: Tooth Segmentation from 3D volume
 - Stage 2: Problem Detection per tooth
 """
+import logging
+
+logger = logging.getLogger(__name__)
 
 # ========================================
 # STAGE 1: Tooth Segmentation (3D)
@@ -37,6 +40,43 @@ CBCT_DETECTION_CONFIG = [
 ]
 
 
+def resolve_model_configs():
+    """
+    Segmentation/detection configs to use: active registry models when set,
+    the defaults above otherwise.
+    
+    Returns:
+        Tuple of (segmentation_config, detection_config)
+    """
+    from app.services.model_cache import get_active_cached
+    
+    # [NEW] Check for active dynamic models
+    active_models = get_active_cached()
+    
+    # 1. CBCT Detection
+    detection_config = CBCT_DETECTION_CONFIG
+    if active_models and 'cbct_detection' in active_models:
+        m = active_models['cbct_detection']
+        logger.info(f"🚀 Using Dynamic CBCT Detection: {m['name']} ({m['id']})")
+        detection_config = [{
+            'name': m['name'],
+            'path': m['path'],
+            'threshold': m.get('threshold', 0.5)
+        }]
+        
+    # 2. CBCT Segmentation
+    segmentation_config = CBCT_SEGMENTATION_CONFIG
+    if active_models and 'cbct_segmentation' in active_models:
+        m = active_models['cbct_segmentation']
+        logger.info(f"🚀 Using Dynamic CBCT Segmentation: {m['name']} ({m['id']})")
+        segmentation_config = {
+            'path': m['path'],
+            'threshold': m.get('threshold', 0.1)
+        }
+    
+    return segmentation_config, detection_config
+
+
 # ========================================
 # Expected Model Input/Output:
 # ========================================
@@ -43,33 +43,11 @@ def complete_medical_processing_aiReport_task(
         logger.info("🔧 Initializing CBCT AI analyzer...")
         
         from app.domains.cbct.analyzer import get_cbct_analyzer
-        from app.domains.cbct.config import CBCT_SEGMENTATION_CONFIG, CBCT_DETECTION_CONFIG
+        from app.domains.cbct.config import CBCT_SEGMENTATION_CONFIG, CBCT_DETECTION_CONFIG, resolve_model_configs
         from app.domains.cbct.report_template import generate_cbct_report_template
-        from app.services.model_manager import ModelManager
 
-        # [NEW] Check for active dynamic models
-        active_models = ModelManager.get_active_model()
-        
-        # 1. CBCT Detection
-        detection_config_to_use = CBCT_DETECTION_CONFIG
-        if active_models and 'cbct_detection' in active_models:
-            m = active_models['cbct_detection']
-            logger.info(f"🚀 Using Dynamic CBCT Detection: {m['name']} ({m['id']})")
-            detection_config_to_use = [{
-                'name': m['name'],
-                'path': m['path'],
-                'threshold': m.get('threshold', 0.5)
-            }]
-            
-        # 2. CBCT Segmentation
-        segmentation_config_to_use = CBCT_SEGMENTATION_CONFIG
-        if active_models and 'cbct_segmentation' in active_models:
-            m = active_models['cbct_segmentation']
-            logger.info(f"🚀 Using Dynamic CBCT Segmentation: {m['name']} ({m['id']})")
-            segmentation_config_to_use = {
-                'path': m['path'],
-                'threshold': m.get('threshold', 0.1)
-            }
+        # [NEW] Active dynamic models, or the static defaults
+        segmentation_config_to_use, detection_config_to_use = resolve_model_configs()
         
         # Get analyzer instance (2-stage: segmentation + detection)
         try:
@@ -98,51 +76,44 @@ def complete_medical_processing_aiReport_task(
             ai_results = None
             ai_status = 'failed'
         
-        # [NEW] Upload Pano Image if generated
+        # [NEW] Upload Pano Image if generated (JPEG bytes straight from the analyzer)
         pano_url = None
-        if ai_results and ai_results.get('pano_image'):
+        if ai_results and ai_results.get('pano_bytes'):
             try:
-                pano_path = ai_results['pano_image']
-                if os.path.exists(pano_path):
-                    logger.info(f"📤 Uploading Pano Image: {pano_path}")
-                    with open(pano_path, 'rb') as f:
-                        file_content = f.read()
-                        
-                    storage_path = f"{clinic_id}/{patient_id}/{report_type}/{report_id}/original.png"
-                    
-                    supabase.storage.from_('reports').upload(
-                        path=storage_path,
-                        file=file_content,
-                        file_options={"content-type": "image/png", "upsert": "true"}
-                    )
-                    
-                    pano_url = supabase.storage.from_('reports').get_public_url(storage_path)
-                    logger.info(f"✅ Pano uploaded: {pano_url}")
+                logger.info("📤 Uploading Pano Image...")
+                storage_path = f"{clinic_id}/{patient_id}/{report_type}/{report_id}/original.png"
+                
+                supabase.storage.from_('reports').upload(
+                    path=storage_path,
+                    file=ai_results['pano_bytes'],
+                    file_options={"content-type": "image/png", "upsert": "true"}
+                )
+                
+                pano_url = supabase.storage.from_('reports').get_public_url(storage_path)
+                logger.info(f"✅ Pano uploaded: {pano_url}")
                     
             except Exception as e:
                 logger.error(f"❌ Failed to upload pano image: {e}")
                 raise Exception(f"Failed to upload pano image to storage: {str(e)}")
-                    # [DEBUG] Upload Debug Axial View if exists
-                    debug_path = pano_path.replace('.jpg', '_debug.jpg')
-                    if os.path.exists(debug_path):
-                        logger.info(f"📤 Uploading Debug Pano Image: {debug_path}")
-                        with open(debug_path, 'rb') as f:
-                            debug_content = f.read()
-                        
-                        debug_storage_path = f"{clinic_id}/{patient_id}/{report_type}/{report_id}/pano_debug.jpg"
-                        
-                        supabase.storage.from_('reports').upload(
-                            path=debug_storage_path,
-                            file=debug_content,
-                            file_options={"content-type": "image/jpeg", "upsert": "true"}
-                        )
-                        debug_url = supabase.storage.from_('reports').get_public_url(debug_storage_path)
-                        logger.info(f"✅ Pano Debug uploaded: {debug_url}")
-                        # Optionally add to report_data if you want frontend to see it
-                        # report_data['aiAnalysis']['pano_debug_url'] = debug_url
+            
+            # [DEBUG] Upload Debug Axial View if exists
+            if ai_results.get('pano_debug_bytes'):
+                try:
+                    logger.info("📤 Uploading Debug Pano Image...")
+                    debug_storage_path = f"{clinic_id}/{patient_id}/{report_type}/{report_id}/pano_debug.jpg"
                     
-            except Exception as e:
-                logger.error(f"⚠️ Failed to upload pano image: {e}")
+                    supabase.storage.from_('reports').upload(
+                        path=debug_storage_path,
+                        file=ai_results['pano_debug_bytes'],
+                        file_options={"content-type": "image/jpeg", "upsert": "true"}
+                    )
+                    debug_url = supabase.storage.from_('reports').get_public_url(debug_storage_path)
+                    logger.info(f"✅ Pano Debug uploaded: {debug_url}")
+                    # Optionally add to report_data if you want frontend to see it
+                    # report_data['aiAnalysis']['pano_debug_url'] = debug_url
+                    
+                except Exception as e:
+                    logger.error(f"⚠️ Failed to upload pano debug image: {e}")
         
         # Step 3: Generate report (with or without AI results)
         logger.info("📄 Building CBCT report...")
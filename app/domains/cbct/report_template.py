@@ -5,6 +5,7 @@ Template structure for CBCT analysis reports.
 Matches Pano structure but for 3D CBCT scans.
 """
 import datetime
+from collections import Counter, defaultdict
 
 
 def generate_cbct_report_template(
@@ -27,6 +28,8 @@ def generate_cbct_report_template(
     Returns:
         Report dictionary with teeth array
     """
+    # One timestamp for scan, analysis and last-updated dates
+    now_iso = datetime.datetime.now().isoformat()
     
     # Extract AI results if available
     teeth_data = []
@@ -44,24 +47,38 @@ def generate_cbct_report_template(
         dims = ai_results.get('dimensions', (0, 0, 0))
         # NIfTI shape is usually (x, y, z)
         # x = sagittal, y = coronal, z = axial
+        # Pad to three so short shapes fall back to 0
+        sagittal, coronal, axial = (*dims, 0, 0, 0)[:3]
         slice_counts = {
-            "sagittal": dims[0] if len(dims) > 0 else 0,
-            "coronal": dims[1] if len(dims) > 1 else 0,
-            "axial": dims[2] if len(dims) > 2 else 0
+            "sagittal": sagittal,
+            "coronal": coronal,
+            "axial": axial
         }
     
     else:
         # Default empty counts if no results
         slice_counts = {"axial": 0, "coronal": 0, "sagittal": 0}
 
-    # Build teeth array with their problems (same as Pano)
+    # Index findings by tooth and tally distributions in a single pass
+    findings_by_tooth = defaultdict(list)
+    problems_distribution = Counter()
+    severity_distribution = Counter()
+    for finding in findings_list:
+        findings_by_tooth[finding.get('tooth_detection_id')].append(finding)
+        problems_distribution[finding.get('problem', 'unknown')] += 1
+        severity_distribution[finding.get('severity', 'unknown')] += 1
+
+    # Build teeth array with their problems (same as Pano), counting as we go
     teeth = []
+    healthy_count = 0
+    unhealthy_count = 0
     for tooth in teeth_data:
-        # Get problems for this tooth
-        tooth_problems = [
-            f for f in findings_list 
-            if f.get('tooth_detection_id') == tooth.get('detection_id')
-        ]
+        # Get problems for this tooth (.get: no empty entries for clean teeth)
+        tooth_problems = findings_by_tooth.get(tooth.get('detection_id'), [])
+        if tooth_problems:
+            unhealthy_count += 1
+        else:
+            healthy_count += 1
         
         teeth.append({
             'toothId': tooth.get('tooth_class'),
@@ -71,18 +88,6 @@ def generate_cbct_report_template(
             'confidence': tooth.get('confidence'),
             'problems': tooth_problems  # Problems attached to this tooth
         })
-    
-    # Calculate statistics
-    healthy_count = len([t for t in teeth if not t['problems']])
-    unhealthy_count = len([t for t in teeth if t['problems']])
-    
-    problems_distribution = {}
-    severity_distribution = {}
-    for finding in findings_list:
-        problem = finding.get('problem', 'unknown')
-        severity = finding.get('severity', 'unknown')
-        problems_distribution[problem] = problems_distribution.get(problem, 0) + 1
-        severity_distribution[severity] = severity_distribution.get(severity, 0) + 1
 
     # Build report (same structure as Pano)
     report = {
@@ -99,14 +104,14 @@ def generate_cbct_report_template(
             "unhealthy": unhealthy_count,
             "treated": 0,  # TODO: Calculate from findings
             "missing": 0,  # TODO: Calculate from segmentation
-            "problemsDistribution": problems_distribution,
-            "severityDistribution": severity_distribution,
+            "problemsDistribution": dict(problems_distribution),
+            "severityDistribution": dict(severity_distribution),
             "requiresAttention": unhealthy_count > 0
         },
         
         "scanInfo": {
             "device": "CBCT Scanner",
-            "scanDate": datetime.datetime.now().isoformat(),
+            "scanDate": now_iso,
             "scanType": "cbct",
             "imageFormat": "DICOM",  # 3D format
             "dimensions": {
@@ -119,7 +124,7 @@ def generate_cbct_report_template(
         "aiAnalysis": {
             "segmentationModel": "",  # Will be populated during analysis
             "detectionModels": [],  # Will be populated during analysis
-            "analysisDate": datetime.datetime.now().isoformat(),
+            "analysisDate": now_iso,
             "processingTime": 0,
             "confidence": 0,
             "status": ai_status
@@ -134,7 +139,7 @@ def generate_cbct_report_template(
             "clinicId": clinic_id,
             "generatedBy": "CBCT AI Analysis System v2",
             "version": "2.0",
-            "lastUpdated": datetime.datetime.now().isoformat(),
+            "lastUpdated": now_iso,
             "slice_count": slice_counts  # [NEW] Added as requested
         }
     }
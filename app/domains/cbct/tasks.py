@@ -1,15 +1,61 @@
 import logging
-import json
 import os
+import orjson
 from datetime import datetime
-from app.celery_app import celery
+from app.celery_app import celery, get_flask_app
+from app.config import Config
 from app.services.job_status import JobStatusManager
 from app.services.supabase_manager import update_report_status
-from app import create_app
+from app.core.uploads import REPORT_JSON_OPTIONS
+from app.utils.file_upload import inflate_gzip_upload
+from app.core.processing.nifti.supabase import process_nifti_to_supabase
+from app.core.processing.dicom.supabase import process_dicom_to_supabase
 from flask import current_app
 
 logger = logging.getLogger(__name__)
 
+# Imported once when the worker loads this module, not on each task call;
+# a missing AI stack still degrades ai_analysis to 'skipped'
+try:
+    from app.domains.cbct.pipeline import complete_medical_processing_aiReport_task
+    PIPELINE_IMPORT_ERROR = None
+except ImportError as e:
+    complete_medical_processing_aiReport_task = None
+    PIPELINE_IMPORT_ERROR = e
+
+
+# -------------------------------------------------------------------------
+# 0. Decode Volume
+# -------------------------------------------------------------------------
+
+@celery.task(bind=True, name='decode_volume')
+def decode_volume_task(self, validation_result):
+    """
+    Inflate a .nii.gz upload once, ahead of the parallel branches.
+    
+    AI analysis and slice upload both read the volume; from a plain .nii
+    they memory-map the same file instead of each decompressing the gzip
+    stream.
+    """
+    task_id = self.request.id
+    try:
+        file_info = dict(validation_result['file_info'])
+        file_path = file_info['path']
+        
+        if file_path.lower().endswith('.nii.gz') and os.path.isfile(file_path):
+            JobStatusManager.create_or_update_status(
+                task_id, 'processing', 'Decompressing volume...', 20
+            )
+            file_info['path'] = inflate_gzip_upload(file_path, Config.MAX_INFLATED_SIZE)
+        
+        return {**validation_result, 'file_info': file_info}
+        
+    except Exception as e:
+        error_msg = f"Volume decode error: {str(e)}"
+        logger.error(error_msg)
+        JobStatusManager.create_or_update_status(task_id, 'failed', error_msg, 0)
+        raise
+
 
 # -------------------------------------------------------------------------
 # 1. AI Analysis
@@ -19,7 +65,7 @@ logger = logging.getLogger(__name__)
 def ai_analysis_task(self, validation_result):
     task_id = self.request.id
     try:
-        app = create_app()
+        app = get_flask_app()
         with app.app_context():
             file_info = validation_result['file_info']
             clinic_id = validation_result.get('clinic_id')
@@ -39,7 +85,8 @@ def ai_analysis_task(self, validation_result):
             # Call Model Center
             ai_result = None
             try:
-                from app.domains.cbct.pipeline import complete_medical_processing_aiReport_task
+                if complete_medical_processing_aiReport_task is None:
+                    raise ImportError(PIPELINE_IMPORT_ERROR)
                 
                 # Get supabase client
                 supabase = current_app.extensions.get('supabase')
@@ -102,112 +149,130 @@ def ai_analysis_task(self, validation_result):
 # 2. Format Report
 # -------------------------------------------------------------------------
 
-@celery.task(bind=True, name='format_report')
-def format_report_task(self, ai_result_dict):
-    """Format AI results into report structure."""
-    task_id = self.request.id
-    try:
-        JobStatusManager.create_or_update_status(
-            task_id, 'processing', 'Formatting AI report...', 50
-        )
-        
-        ai_result = ai_result_dict.get('ai_result', {})
-        report_id = ai_result_dict.get('report_id')
-        clinic_id = ai_result_dict.get('clinic_id')
-        patient_id = ai_result_dict.get('patient_id')
-        report_type = ai_result_dict.get('report_type', 'cbct')
-        
-        # Format report
-        report = {
-            'report_id': report_id,
-            'clinic_id': clinic_id,
-            'patient_id': patient_id,
-            'report_type': report_type,
-            'ai_analysis': ai_result,
-            'timestamp': datetime.utcnow().isoformat(),
-            'version': '2.0',
-            'generated_by': 'medical_processor_v2'
-        }
-        
-        result = {
-            'report': report,
-            'report_id': report_id,
-            'clinic_id': clinic_id,
-            'patient_id': patient_id,
-            'report_type': report_type
-        }
-        
-        JobStatusManager.create_or_update_status(
-            task_id, 'completed', 'Report formatted', 100, result
-        )
-        logger.info(f"✅ Report formatted for {report_id}")
-        return result
-        
-    except Exception as e:
-        error_msg = f"Report formatting error: {str(e)}"
-        logger.error(error_msg)
-        JobStatusManager.create_or_update_status(task_id, 'failed', error_msg, 0)
-        raise
+def _build_report(ai_result_dict):
+    """Wrap the AI result into the report structure (pure, in-memory)."""
+    ai_result = ai_result_dict.get('ai_result', {})
+    report_id = ai_result_dict.get('report_id')
+    clinic_id = ai_result_dict.get('clinic_id')
+    patient_id = ai_result_dict.get('patient_id')
+    report_type = ai_result_dict.get('report_type', 'cbct')
+    
+    # Format report
+    report = {
+        'report_id': report_id,
+        'clinic_id': clinic_id,
+        'patient_id': patient_id,
+        'report_type': report_type,
+        'ai_analysis': ai_result,
+        'timestamp': datetime.utcnow().isoformat(),
+        'version': '2.0',
+        'generated_by': 'medical_processor_v2'
+    }
+    
+    return {
+        'report': report,
+        'report_id': report_id,
+        'clinic_id': clinic_id,
+        'patient_id': patient_id,
+        'report_type': report_type
+    }
 
 
 # -------------------------------------------------------------------------
 # 3. Upload Report
 # -------------------------------------------------------------------------
 
+def _upload_report(task_id, report_dict):
+    """Upload a formatted report JSON to Supabase storage (needs an app context)."""
+    report = report_dict['report']
+    report_id = report_dict['report_id']
+    clinic_id = report_dict['clinic_id']
+    patient_id = report_dict['patient_id']
+    report_type = report_dict['report_type']
+    
+    if report_id:
+        update_report_status(report_id, "report_upload_started")
+    
+    JobStatusManager.create_or_update_status(
+        task_id, 'processing', 'Uploading report to Supabase...', 60
+    )
+    
+    # Serialize straight to UTF-8 bytes (no intermediate str)
+    report_json = orjson.dumps(report, option=REPORT_JSON_OPTIONS)
+    storage_path = f"{clinic_id}/{patient_id}/{report_type}/{report_id}/report.json"
+    
+    supabase = current_app.extensions.get('supabase')
+    if not supabase:
+        raise Exception("Supabase client not initialized")
+    
+    supabase.storage.from_('reports').upload(
+        path=storage_path,
+        file=report_json,
+        file_options={"content-type": "application/json", "upsert": "true"}
+    )
+    
+    public_url = supabase.storage.from_('reports').get_public_url(storage_path)
+    
+    if report_id:
+        update_report_status(report_id, "report_uploaded")
+    
+    result = {
+        'status': 'report_uploaded',
+        'report_url': public_url,
+        'report_id': report_id,
+        'storage_path': storage_path
+    }
+    
+    JobStatusManager.create_or_update_status(
+        task_id, 'completed', 'Report uploaded to Supabase', 100, result
+    )
+    logger.info(f"✅ Report uploaded: {public_url}")
+    return result
+
+
 @celery.task(bind=True, name='upload_report_json')
 def upload_report_json_task(self, report_dict):
     """Upload report JSON to Supabase storage."""
     task_id = self.request.id
     try:
-        app = create_app()
+        app = get_flask_app()
         with app.app_context():
-            report = report_dict['report']
             report_id = report_dict['report_id']
-            clinic_id = report_dict['clinic_id']
-            patient_id = report_dict['patient_id']
-            report_type = report_dict['report_type']
-            
-            if report_id:
-                update_report_status(report_id, "report_upload_started")
+            return _upload_report(task_id, report_dict)
             
+    except Exception as e:
+        error_msg = f"Report upload error: {str(e)}"
+        logger.error(error_msg)
+        if 'report_id' in locals() and report_id:
+            update_report_status(report_id, "report_upload_failed")
+        JobStatusManager.create_or_update_status(task_id, 'failed', error_msg, 0)
+        raise
+
+
+@celery.task(bind=True, name='format_and_upload_report')
+def format_and_upload_report_task(self, ai_result_dict):
+    """
+    Format AI results and upload the report JSON in one task.
+    
+    The formatting is cheap in-memory work, so doing it inline saves a
+    broker hop and one serialize/deserialize of the whole AI result.
+    """
+    task_id = self.request.id
+    try:
+        app = get_flask_app()
+        with app.app_context():
             JobStatusManager.create_or_update_status(
-                task_id, 'processing', 'Uploading report to Supabase...', 60
+                task_id, 'processing', 'Formatting AI report...', 50
             )
             
-            # Convert to JSON
-            report_json = json.dumps(report, indent=2)
-            storage_path = f"{clinic_id}/{patient_id}/{report_type}/{report_id}/report.json"
-            
-            supabase = current_app.extensions.get('supabase')
-            if not supabase:
-                raise Exception("Supabase client not initialized")
-            
-            supabase.storage.from_('reports').upload(
-                path=storage_path,
-                file=report_json.encode('utf-8'),
-                file_options={"content-type": "application/json", "upsert": "true"}
-            )
-            
-            public_url = supabase.storage.from_('reports').get_public_url(storage_path)
-            
-            if report_id:
-                update_report_status(report_id, "report_uploaded")
-            
-            result = {
-                'status': 'report_uploaded',
-                'report_url': public_url,
-                'report_id': report_id,
-                'storage_path': storage_path
-            }
+            report_dict = _build_report(ai_result_dict)
+            report_id = report_dict['report_id']
+            logger.info(f"✅ Report formatted for {report_id}")
             
-            JobStatusManager.create_or_update_status(
-                task_id, 'completed', 'Report uploaded to Supabase', 100, result
-            )
-            logger.info(f"✅ Report uploaded: {public_url}")
-            return result
+            return _upload_report(task_id, report_dict)
             
     except Exception as e:
-        error_msg = f"Report upload error: {str(e)}"
+        error_msg = f"Report format/upload error: {str(e)}"
         logger.error(error_msg)
         if 'report_id' in locals() and report_id:
             update_report_status(report_id, "report_upload_failed")
@@ -224,7 +289,7 @@ def upload_slices_task(self, validation_result):
     """Process file and upload slices to Supabase."""
     task_id = self.request.id
     try:
-        app = create_app()
+        app = get_flask_app()
         with app.app_context():
             file_info = validation_result['file_info']
             file_path = file_info['path']
@@ -255,8 +320,6 @@ def upload_slices_task(self, validation_result):
             
             # Detect file type and process
             if file_path.endswith(('.nii', '.nii.gz')):
-                # NOTE: Updated to app.core.processing
-                from app.core.processing.nifti.supabase import process_nifti_to_supabase
                 result = process_nifti_to_supabase(
                     file_path,
                     supabase,
@@ -272,8 +335,6 @@ def upload_slices_task(self, validation_result):
                 else:
                     dicom_dir = file_path
                 
-                # NOTE: Updated to app.core.processing
-                from app.core.processing.dicom.supabase import process_dicom_to_supabase
                 result = process_dicom_to_supabase(
                     dicom_dir,
                     supabase,
@@ -322,19 +383,14 @@ def finalize_report_task(self, results):
     """Aggregate results and update report status to completed."""
     task_id = self.request.id
     try:
-        app = create_app()
+        app = get_flask_app()
         with app.app_context():
             JobStatusManager.create_or_update_status(
                 task_id, 'processing', 'Finalizing workflow...', 90
             )
             
-            # Extract results from group
-            if isinstance(results, (list, tuple)) and len(results) == 2:
-                report_result = results[0] if isinstance(results[0], dict) else {}
-                slices_result = results[1] if isinstance(results[1], dict) else {}
-            else:
-                report_result = {}
-                slices_result = results if isinstance(results, dict) else {}
+            # Chord header results, in branch order
+            report_result, slices_result = results
             
             report_id = (
                 report_result.get('report_id') or 
@@ -349,12 +405,14 @@ def finalize_report_task(self, results):
                 raise Exception("Supabase client not initialized")
             
             update_data = {'status': 'completed'}
+            report_url = report_result.get('report_url')
+            slice_counts = slices_result.get('slice_counts')
             
-            if report_result.get('report_url'):
-                 logger.info(f"Report URL generated: {report_result['report_url']}")
+            if report_url:
+                 logger.info(f"Report URL generated: {report_url}")
             
-            if slices_result.get('slice_counts'):
-                 logger.info(f"Slice counts calculated: {slices_result['slice_counts']}")
+            if slice_counts:
+                 logger.info(f"Slice counts calculated: {slice_counts}")
             
             # Update Supabase
             try:
@@ -367,8 +425,8 @@ def finalize_report_task(self, results):
                 'status': 'completed',
                 'report_id': report_id,
                 'message': 'Workflow completed successfully',
-                'report_url': report_result.get('report_url'),
-                'slice_counts': slices_result.get('slice_counts'),
+                'report_url': report_url,
+                'slice_counts': slice_counts,
                 'total_slices': slices_result.get('total_slices'),
                 'workflow_completed': True
             }
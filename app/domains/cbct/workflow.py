@@ -1,5 +1,5 @@
 
-from celery import chain, group
+from celery import chain, chord, group
 from app.celery_app import celery
 import logging
 
@@ -20,19 +20,29 @@ def start_cbct_workflow(file_info, upload_id, clinic_id=None, patient_id=None, r
             'report_id': report_id
         }
         
-        workflow = chain(
+        # Compressed NIfTI: inflate once up front, then both branches take
+        # the decoded path from decode_volume's result instead of args
+        decode_first = file_info.get('path', '').lower().endswith('.nii.gz')
+        branch_args = [] if decode_first else [validation_result]
+        
+        # chord: finalize_report always gets [report_result, slices_result]
+        workflow = chord(
             group(
-       
                 chain(
-                    celery.signature('ai_analysis', args=[validation_result]),
-                    celery.signature('format_report'),
-                    celery.signature('upload_report_json')
+                    celery.signature('ai_analysis', args=branch_args),
+                    celery.signature('format_and_upload_report')
                 ),
-                celery.signature('upload_slices', args=[validation_result])
+                celery.signature('upload_slices', args=branch_args)
             ),
             celery.signature('finalize_report')
         )
         
+        if decode_first:
+            workflow = chain(
+                celery.signature('decode_volume', args=[validation_result]),
+                workflow
+            )
+        
         result = workflow.apply_async()
         logger.info(f"Workflow started with ID: {result.id}")
         
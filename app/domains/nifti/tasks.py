@@ -1,10 +1,10 @@
 
 import logging
 import os
-from app.celery_app import celery
+from app.celery_app import celery, get_flask_app
 from app.services.job_status import JobStatusManager
 from app.services.supabase_manager import update_report_status
-from app import create_app
+from app.core.processing.nifti.supabase import process_nifti_to_supabase
 from flask import current_app
 
 logger = logging.getLogger(__name__)
@@ -16,7 +16,7 @@ def process_nifti_slices_task(self, validation_result):
     """
     task_id = self.request.id
     try:
-        app = create_app()
+        app = get_flask_app()
         with app.app_context():
             file_info = validation_result['file_info']
             file_path = file_info['path']
@@ -47,8 +47,6 @@ def process_nifti_slices_task(self, validation_result):
                     )
             
             # Use existing NIfTI processing logic
-            from app.core.processing.nifti.supabase import process_nifti_to_supabase
-            
             result = process_nifti_to_supabase(
                 file_path,
                 supabase,
@@ -95,7 +93,7 @@ def finalize_nifti_workflow_task(self, result):
     """
     task_id = self.request.id
     try:
-        app = create_app()
+        app = get_flask_app()
         with app.app_context():
             logger.info(f"Finalizing NIfTI workflow with result: {result}")
             
@@ -10,14 +10,28 @@ import os
 os.environ["TORCH_SERIALIZATION_WEIGHTS_ONLY"] = "0"
 
 import logging
+import shutil
+import tempfile
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any
 
+from app.domains.pano.config import USE_CUDA_TUNING, USE_HALF_PRECISION, USE_TENSORRT_ENGINES, USE_TORCH_COMPILE
+
+try:
+    import fcntl
+except ImportError:  # Non-POSIX: engine exports are not serialized across processes
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
 
 class PanoAIAnalyzer:
     """Main analyzer that orchestrates the AI pipeline."""
     
+    CROP_BATCH_SIZE = 16  # Tooth crops per detector forward pass
+    WARMUP_IMGSZ = 640  # Dummy frame size for the post-load warmup pass
+    
     def __init__(self, segmentation_config: Dict = None, detection_config: List[Dict] = None, detection_strategy: str = 'GLOBAL'):
         """
         Initialize analyzer with separate configurations for each stage.
@@ -32,33 +46,60 @@ class PanoAIAnalyzer:
         self.problem_detectors = {}
         self.detection_config = detection_config or []
         self.detection_strategy = detection_strategy
+        self.predict_args = {}  # Device/precision kwargs for every predict call
         
     def load_models(self):
         """Load all AI models dynamically based on configurations."""
         try:
             logger.info("🔧 Starting model loading...")
             
-            # STAGE 1: Load segmentation model
-            if self.segmentation_config:
-                seg_path = self.segmentation_config.get('path')
-                if seg_path:
+            self.predict_args = self._resolve_predict_args()
+            
+            if not self.segmentation_config:
+                raise ValueError("No segmentation config provided - models are required!")
+            seg_path = self.segmentation_config.get('path')
+            
+            if not self.detection_config:
+                logger.warning("⚠️ No detection models configured")
+            
+            # Vérifier si les fichiers existent (avant de lancer les chargements)
+            if seg_path and not os.path.exists(seg_path):
+                raise FileNotFoundError(f"Segmentation model not found: {seg_path}")
+            for config in self.detection_config:
+                if not os.path.exists(config['path']):
+                    raise FileNotFoundError(f"Detection model '{config['name']}' not found: {config['path']}")
+            
+            # TensorRT engines are built one at a time, before the parallel
+            # loads: concurrent builds on one GPU risk OOM and skew tactic timing
+            weights = {
+                path: self._weights_path(path)
+                for path in [seg_path] + [config['path'] for config in self.detection_config]
+                if path
+            }
+            
+            # Each load is an independent disk read + torch.load: run them all
+            # at once, then consume the results in config order below
+            with ThreadPoolExecutor(max_workers=min(8, len(self.detection_config) + 1)) as executor:
+                seg_future = executor.submit(self._load_yolo, weights[seg_path]) if seg_path else None
+                detector_futures = [
+                    (config, executor.submit(self._load_yolo, weights[config['path']]))
+                    for config in self.detection_config
+                ]
+                
+                # STAGE 1: Load segmentation model
+                if seg_future is not None:
                     logger.info(f"📦 Stage 1: Loading segmentation model from {seg_path}")
                     
-                    # Vérifier si le fichier existe
-                    if not os.path.exists(seg_path):
-                        raise FileNotFoundError(f"Segmentation model not found: {seg_path}")
-                    
                     # Charger le modèle YOLO
                     try:
-                        from ultralytics import YOLO
-                        
-                        model = YOLO(seg_path)
+                        model = seg_future.result()
                         logger.info(f"   📊 Model type: {type(model).__name__}")
                         
                         self.segmentation_model = {
                             'model': model,
                             'threshold': self.segmentation_config.get('threshold', 0.2),
-                            'path': seg_path
+                            'path': seg_path,
+                            'half': self.predict_args.get('half', False)
                         }
                         logger.info("✅ Segmentation model loaded")
                         
@@ -72,48 +113,170 @@ class PanoAIAnalyzer:
                             'path': seg_path
                         }
                         logger.info("✅ Segmentation model loaded (placeholder)")
-            else:
-                raise ValueError("No segmentation config provided - models are required!")
-            
-            # STAGE 2: Load problem detection models dynamically
-            if not self.detection_config:
-                logger.warning("⚠️ No detection models configured")
-            
-            for config in self.detection_config:
-                model_name = config['name']
-                model_path = config['path']
-                
-                logger.info(f"📦 Stage 2: Loading detection model '{model_name}' from {model_path}")
                 
-                # Vérifier si le fichier existe
-                if not os.path.exists(model_path):
-                    raise FileNotFoundError(f"Detection model '{model_name}' not found: {model_path}")
-                
-                # Load YOLO model for detection
-                try:
-                    from ultralytics import YOLO
+                # STAGE 2: Load problem detection models dynamically
+                for config, future in detector_futures:
+                    model_name = config['name']
+                    model_path = config['path']
                     
-                    model = YOLO(model_path)
-                    logger.info(f"   📊 Detection Model type: {type(model).__name__}")
+                    logger.info(f"📦 Stage 2: Loading detection model '{model_name}' from {model_path}")
                     
-                    self.problem_detectors[model_name] = {
-                        'model': model,
-                        'threshold': config.get('threshold', 0.2),
-                        'path': model_path
-                    }
-                    logger.info(f"✅ Detection model '{model_name}' loaded")
-                    
-                except ImportError as e:
-                    logger.warning(f"⚠️ ultralytics not installed - skipping {model_name}. Error: {e}")
-                except Exception as e:
-                    logger.warning(f"⚠️ Error loading detection model {model_name}: {e}")
+                    # Load YOLO model for detection
+                    try:
+                        model = future.result()
+                        logger.info(f"   📊 Detection Model type: {type(model).__name__}")
+                        
+                        self.problem_detectors[model_name] = {
+                            'model': model,
+                            'threshold': config.get('threshold', 0.2),
+                            'path': model_path,
+                            'half': self.predict_args.get('half', False)
+                        }
+                        logger.info(f"✅ Detection model '{model_name}' loaded")
+                        
+                    except ImportError as e:
+                        logger.warning(f"⚠️ ultralytics not installed - skipping {model_name}. Error: {e}")
+                    except Exception as e:
+                        logger.warning(f"⚠️ Error loading detection model {model_name}: {e}")
             
             logger.info(f"🎉 Successfully loaded segmentation model + {len(self.problem_detectors)} detection models")
             
+            self._warmup()
+            
         except Exception as e:
             logger.error(f"❌ Failed to load AI models: {e}")
             raise
     
+    def _load_yolo(self, model_path: str):
+        """Helper: Build a YOLO model from a weights file (run on the loader pool)."""
+        from ultralytics import YOLO
+        return YOLO(model_path)
+    
+    def _weights_path(self, model_path: str) -> str:
+        """Helper: Weights file to load: the TensorRT engine when enabled on GPU, else the .pt."""
+        if USE_TENSORRT_ENGINES and self.predict_args:
+            return self._engine_path(model_path)
+        return model_path
+    
+    @staticmethod
+    def _engine_fresh(engine_path: str, model_path: str) -> bool:
+        return os.path.exists(engine_path) and os.path.getmtime(engine_path) >= os.path.getmtime(model_path)
+    
+    def _engine_path(self, model_path: str) -> str:
+        """
+        Helper: TensorRT engine cached next to the .pt, exported on first use.
+        
+        The engine is rebuilt when the .pt is newer. Worker processes that
+        start together serialize on a lock file, and the engine is exported
+        in a temp dir then renamed into place, so a half-written engine is
+        never loaded. Falls back to the .pt if export fails (e.g. tensorrt
+        not installed).
+        """
+        engine_path = os.path.splitext(model_path)[0] + '.engine'
+        if self._engine_fresh(engine_path, model_path):
+            return engine_path
+        
+        try:
+            with open(engine_path + '.lock', 'w') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                
+                # Another process may have built it while we waited
+                if self._engine_fresh(engine_path, model_path):
+                    return engine_path
+                
+                from ultralytics import YOLO
+                logger.info(f"🏗️ Exporting TensorRT engine for {model_path} (one-time)...")
+                
+                # ultralytics writes the engine next to its source weights, so
+                # export from a private copy and publish it with one rename
+                build_dir = tempfile.mkdtemp(dir=os.path.dirname(engine_path) or '.')
+                try:
+                    build_weights = shutil.copy2(model_path, build_dir)
+                    # Dynamic shapes up to a full crop batch, so PER_TOOTH batching still fits
+                    built = YOLO(build_weights).export(
+                        format='engine',
+                        half=self.predict_args.get('half', False),
+                        dynamic=True,
+                        batch=self.CROP_BATCH_SIZE,
+                        device=0
+                    )
+                    os.replace(built, engine_path)
+                finally:
+                    shutil.rmtree(build_dir, ignore_errors=True)
+                return engine_path
+        except Exception as e:
+            logger.warning(f"⚠️ TensorRT export failed for {model_path}, using PyTorch weights: {e}")
+            return model_path
+    
+    def _warmup(self):
+        """Run one dummy prediction per GPU model so the first request skips CUDA init/autotune."""
+        if not self.predict_args:
+            return
+        
+        dummy = np.zeros((self.WARMUP_IMGSZ, self.WARMUP_IMGSZ, 3), dtype=np.uint8)
+        models = [self.segmentation_model] if self.segmentation_model else []
+        models.extend(self.problem_detectors.values())
+        for info in models:
+            if info['model'] is None:
+                continue
+            try:
+                info['model'].predict(dummy, verbose=False, **self.predict_args)
+                
+                # The first predict built the (fused, half) backend; compile
+                # that and trigger the compile here, not on a real request
+                if USE_TORCH_COMPILE and self._compile_backend(info['model']):
+                    info['model'].predict(dummy, verbose=False, **self.predict_args)
+            except Exception as e:
+                logger.warning(f"⚠️ Warmup failed for {info['path']}: {e}")
+        logger.info("🔥 YOLO models warmed up")
+    
+    @staticmethod
+    def _compile_backend(model) -> bool:
+        """
+        Helper: Swap the predictor's PyTorch network for a torch.compile'd one.
+        
+        Returns:
+            True if compiled (TensorRT engines and already-compiled models are left alone)
+        """
+        import torch
+        
+        backend = getattr(model.predictor, 'model', None)
+        if backend is None or not getattr(backend, 'pt', False):
+            return False
+        if hasattr(backend.model, '_orig_mod'):  # Already an OptimizedModule
+            return False
+        
+        # dynamic=True: letterboxed pano sizes vary, avoid a recompile per shape
+        backend.model = torch.compile(backend.model, dynamic=True)
+        return True
+    
+    def _resolve_predict_args(self) -> Dict[str, Any]:
+        """
+        Pick the inference device and precision once for all models.
+        
+        Returns:
+            predict() kwargs: GPU 0 (FP16 when enabled) if CUDA is available,
+            otherwise empty (ultralytics' CPU default)
+        """
+        try:
+            import torch
+            if torch.cuda.is_available():
+                # TF32 tensor cores for whatever still runs in FP32; cuDNN picks
+                # the fastest conv algorithms per input shape (paid at warmup).
+                # Process-wide flags: they also change CBCT numerics and
+                # autotuning in the same worker, hence opt-in
+                if USE_CUDA_TUNING:
+                    torch.backends.cuda.matmul.allow_tf32 = True
+                    torch.backends.cudnn.allow_tf32 = True
+                    torch.backends.cudnn.benchmark = True
+                
+                logger.info(f"⚡ YOLO inference on CUDA (half precision: {USE_HALF_PRECISION})")
+                return {'device': 0, 'half': USE_HALF_PRECISION}
+        except ImportError:
+            pass
+        return {}
+    
     def analyze_pano_image(self, image_path: str) -> Dict[str, Any]:
         """
         Run complete AI analysis pipeline.
@@ -128,14 +291,17 @@ class PanoAIAnalyzer:
             logger.info("🚀 Starting AI analysis pipeline...")
             logger.info(f"📸 Image: {image_path}")
             
+            # Decode once; every stage below reuses this array
+            image = self._load_image(image_path)
+            
             # Stage 1: Segment teeth
             logger.info("🦷 Stage 1: Segmenting teeth...")
-            teeth_segments = self._segment_teeth(image_path)
+            teeth_segments = self._segment_teeth(image_path, image)
             logger.info(f"✅ Found {len(teeth_segments)} teeth")
             
             # Stage 2: Detect problems on each tooth
             logger.info(f"🔍 Stage 2: Analyzing problems (Strategy: {self.detection_strategy})...")
-            findings = self._detect_problems(teeth_segments, image_path)
+            findings = self._detect_problems(teeth_segments, image_path, image)
             logger.info(f"✅ Detection complete: {len(findings)} findings")
             
             # Format results
@@ -155,10 +321,14 @@ class PanoAIAnalyzer:
             logger.error(f"❌ AI analysis failed: {e}")
             raise
     
-    def _segment_teeth(self, image_path: str) -> List[Dict]:
+    def _segment_teeth(self, image_path: str, image=None) -> List[Dict]:
         """
         Stage 1: Segment individual teeth from pano image.
         
+        Args:
+            image_path: Path to panoramic image
+            image: Already decoded BGR array (decoded from image_path if None)
+        
         Returns:
             List of tooth segments with metadata
         """
@@ -166,63 +336,73 @@ class PanoAIAnalyzer:
         if self.segmentation_model and self.segmentation_model['model'] is not None:
             model = self.segmentation_model['model']
             threshold = self.segmentation_model['threshold']
+            source = image if image is not None else image_path
             
             # Run inference
             logger.info(f"🔍 Running YOLO inference with confidence threshold: {threshold}")
             
-            # --- DEBUG START ---
-            try:
-                # 1. Verify Image Loading
-                import cv2
-                import numpy as np
-                path_str = str(image_path)
-                
-                # Check file existence and size
-                if os.path.exists(path_str):
-                    size = os.path.getsize(path_str)
-                    logger.info(f"📂 DEBUG: File exists. Size: {size} bytes. Path: {path_str}")
-                else:
-                    logger.error(f"❌ DEBUG: File NOT found at {path_str}")
-
-                # Attempt to read image
-                img = cv2.imread(path_str)
-                if img is None:
-                    logger.error(f"❌ DEBUG: cv2.imread returned None! Image might be corrupted or format unsupported.")
-                else:
-                    logger.info(f"🔍 DEBUG: Image loaded successfully. Shape: {img.shape}, Type: {img.dtype}")
-                    logger.info(f"📊 DEBUG: Pixel stats - Min: {np.min(img)}, Max: {np.max(img)}, Mean: {np.mean(img):.2f}")
-                    
-                    # 2. Save Debug Input Image
-                    # Save to a dedicated debug folder in the same directory as the image
-                    image_dir = os.path.dirname(path_str)
-                    debug_dir = os.path.join(image_dir, "debug_output")
-                    os.makedirs(debug_dir, exist_ok=True)
+            # Input inspection and annotated prediction dumps cost a full
+            # decode/encode + file writes per request: debug logging only
+            debug = logger.isEnabledFor(logging.DEBUG)
+            
+            if debug:
+                # --- DEBUG START ---
+                try:
+                    # 1. Verify Image Loading
+                    import cv2
+                    path_str = str(image_path)
                     
-                    debug_input_path = os.path.join(debug_dir, "debug_input_check.jpg")
-                    cv2.imwrite(debug_input_path, img)
-                    logger.info(f"💾 DEBUG: Saved input check image to {debug_input_path}")
-            except Exception as e:
-                logger.error(f"⚠️ DEBUG: Error during image inspection: {e}")
-            # --- DEBUG END ---
+                    # Check file existence and size
+                    if os.path.exists(path_str):
+                        size = os.path.getsize(path_str)
+                        logger.info(f"📂 DEBUG: File exists. Size: {size} bytes. Path: {path_str}")
+                    else:
+                        logger.error(f"❌ DEBUG: File NOT found at {path_str}")
 
-            # Run prediction with save=True to visualize what the model "sees"
-            # We use a temp project dir to avoid cluttering, but accessible enough
-            try:
-                pred_project = os.path.join(os.path.dirname(str(image_path)), "debug_preds")
-                results = model.predict(
-                    image_path, 
-                    conf=threshold, 
-                    verbose=True, # Enable verbose for logs
-                    save=True,    # Save annotated image
-                    project=pred_project,
-                    name='prediction',
-                    exist_ok=True
-                )
-                logger.info(f"💾 DEBUG: Saved model prediction visualization to {pred_project}")
-            except Exception as e:
-                logger.error(f"⚠️ DEBUG: Prediction failed or save failed: {e}")
-                # Fallback to standard prediction if save/project fails
-                results = model.predict(image_path, conf=threshold, verbose=False)
+                    # Attempt to read image (reuse the analysis decode when given)
+                    img = image if image is not None else cv2.imread(path_str)
+                    if img is None:
+                        logger.error(f"❌ DEBUG: cv2.imread returned None! Image might be corrupted or format unsupported.")
+                    else:
+                        logger.info(f"🔍 DEBUG: Image loaded successfully. Shape: {img.shape}, Type: {img.dtype}")
+                        logger.info(f"📊 DEBUG: Pixel stats - Min: {np.min(img)}, Max: {np.max(img)}, Mean: {np.mean(img):.2f}")
+                        
+                        # 2. Save Debug Input Image
+                        # Save to a dedicated debug folder in the same directory as the image
+                        image_dir = os.path.dirname(path_str)
+                        debug_dir = os.path.join(image_dir, "debug_output")
+                        os.makedirs(debug_dir, exist_ok=True)
+                        
+                        debug_input_path = os.path.join(debug_dir, "debug_input_check.jpg")
+                        cv2.imwrite(debug_input_path, img)
+                        logger.info(f"💾 DEBUG: Saved input check image to {debug_input_path}")
+                except Exception as e:
+                    logger.error(f"⚠️ DEBUG: Error during image inspection: {e}")
+                # --- DEBUG END ---
+
+            results = None
+            if debug:
+                # Run prediction with save=True to visualize what the model "sees"
+                # We use a temp project dir to avoid cluttering, but accessible enough
+                try:
+                    pred_project = os.path.join(os.path.dirname(str(image_path)), "debug_preds")
+                    results = model.predict(
+                        source, 
+                        conf=threshold, 
+                        verbose=True, # Enable verbose for logs
+                        save=True,    # Save annotated image
+                        project=pred_project,
+                        name='prediction',
+                        exist_ok=True,
+                        **self.predict_args
+                    )
+                    logger.info(f"💾 DEBUG: Saved model prediction visualization to {pred_project}")
+                except Exception as e:
+                    logger.error(f"⚠️ DEBUG: Prediction failed or save failed: {e}")
+            
+            if results is None:
+                # Standard prediction (also the fallback if save/project fails)
+                results = model.predict(source, conf=threshold, verbose=False, **self.predict_args)
 
             # Parse YOLO results into expected format
             raw_predictions = {"predictions": []}
@@ -318,7 +498,7 @@ class PanoAIAnalyzer:
             logger.info(f"   📌 Tooth types: {len([t for t in teeth_segments if t['tooth_type']=='upper'])} upper, {len([t for t in teeth_segments if t['tooth_type']=='lower'])} lower")
         return teeth_segments
     
-    def _detect_problems(self, teeth_segments: List[Dict], image_path: str = None) -> List[Dict]:
+    def _detect_problems(self, teeth_segments: List[Dict], image_path: str = None, image=None) -> List[Dict]:
         """
         Stage 2: Run problem detection models.
         
@@ -327,17 +507,23 @@ class PanoAIAnalyzer:
         - 'PER_TOOTH': Crop each tooth -> Run on crop -> Assign to tooth.
         """
         if self.detection_strategy == 'PER_TOOTH':
-            return self._detect_problems_per_tooth(teeth_segments, image_path)
+            return self._detect_problems_per_tooth(teeth_segments, image_path, image)
         else:
-            return self._detect_problems_global(teeth_segments, image_path)
+            return self._detect_problems_global(teeth_segments, image_path, image)
 
-    def _detect_problems_global(self, teeth_segments: List[Dict], image_path: str) -> List[Dict]:
+    def _detect_problems_global(self, teeth_segments: List[Dict], image_path: str, image=None) -> List[Dict]:
         """Run detection on GLOBAL full image and map to teeth."""
         findings = []
         all_detections = []
         
         logger.info("🌍 Strategy: GLOBAL (Full Image Scan)")
         
+        # Decode once and hand every detector the same BGR array (what
+        # ultralytics would load itself), instead of N reads + decodes
+        if image is None:
+            image = self._load_image(image_path)
+        source = image if image is not None else image_path
+        
         # 1. Run all detection models on the full image
         for detector_name, detector_info in self.problem_detectors.items():
             model = detector_info['model']
@@ -350,7 +536,7 @@ class PanoAIAnalyzer:
             
             try:
                 # Run inference on full image
-                results = model.predict(image_path, conf=threshold, verbose=False)
+                results = model.predict(source, conf=threshold, verbose=False, **self.predict_args)
                 
                 # Collect all detections
                 for result in results:
@@ -378,61 +564,79 @@ class PanoAIAnalyzer:
             
         return findings
 
-    def _detect_problems_per_tooth(self, teeth_segments: List[Dict], image_path: str) -> List[Dict]:
+    def _detect_problems_per_tooth(self, teeth_segments: List[Dict], image_path: str, image=None) -> List[Dict]:
         """Run detection PER TOOTH (Cropped)."""
         findings = []
         
         logger.info("🦷 Strategy: PER_TOOTH (Individual Crops)")
         
+        # Every crop is a view into one decoded image
+        if image is None:
+            image = self._load_image(image_path)
+        if image is None:
+            logger.error(f"❌ Could not decode image for cropping: {image_path}")
+            return findings
+        
+        # Crop every tooth first so each detector sees all crops in one batched call
+        teeth = []
+        crops = []
         for tooth in teeth_segments:
-            detection_id = tooth['detection_id']
-            tooth_class = tooth['tooth_class']
-            bbox = tooth['bbox']
-            
             # Skip non-tooth objects if needed
             if tooth['tooth_type'] in ['bridge', 'denture', 'unknown']:
                 continue
             
             # Crop tooth region
-            tooth_region_img = self._crop_tooth_image(image_path, bbox)
+            tooth_region_img = self._crop_tooth_image(image, tooth['bbox'])
             
             if tooth_region_img is None:
-                # logger.warning(f"⚠️ Failed to crop tooth {tooth_class}")
+                # logger.warning(f"⚠️ Failed to crop tooth {tooth['tooth_class']}")
                 continue
             
-            # Run each detector on this tooth
-            for detector_name, detector_info in self.problem_detectors.items():
-                model = detector_info['model']
-                threshold = detector_info['threshold']
-                
-                if model is None: continue
-                
-                try:
-                    # Predict on CROPPED image
-                    results = model.predict(tooth_region_img, conf=threshold, verbose=False)
+            teeth.append(tooth)
+            crops.append(tooth_region_img)
+        
+        if not crops:
+            logger.info("✅ Problem detection completed: 0 findings")
+            return findings
+        
+        # Run each detector once over the whole batch of crops
+        results_by_detector = {}
+        for detector_name, detector_info in self.problem_detectors.items():
+            model = detector_info['model']
+            threshold = detector_info['threshold']
+            
+            if model is None: continue
+            
+            try:
+                # Predict on CROPPED images (one result per crop, in order)
+                results_by_detector[detector_name] = model.predict(
+                    crops, conf=threshold, batch=self.CROP_BATCH_SIZE, verbose=False,
+                    **self.predict_args
+                )
+            except Exception as e:
+                logger.error(f"❌ Error running detector {detector_name} on tooth crops: {e}")
+        
+        # Emit findings tooth by tooth, detectors in configured order
+        for i, tooth in enumerate(teeth):
+            for detector_name, results in results_by_detector.items():
+                result = results[i]
+                for box in result.boxes:
+                    confidence = float(box.conf[0])
+                    class_id = int(box.cls[0])
+                    problem_name = result.names[class_id]
                     
-                    for result in results:
-                        boxes = result.boxes
-                        for box in boxes:
-                            confidence = float(box.conf[0])
-                            class_id = int(box.cls[0])
-                            problem_name = result.names[class_id]
-                            
-                            findings.append({
-                                'tooth_detection_id': detection_id,
-                                'tooth_class': tooth_class,
-                                'tooth_number': tooth['tooth_number'],
-                                'tooth_type': tooth['tooth_type'],
-                                'problem': problem_name,
-                                'confidence': confidence,
-                                'bbox': box.xywh[0].tolist(), # Relative to crop
-                                'severity': 'medium', 
-                                'description': f"Detected {problem_name}",
-                                'detected_by': detector_name
-                            })
-                            
-                except Exception as e:
-                    logger.error(f"❌ Error running detector {detector_name} on {tooth_class}: {e}")
+                    findings.append({
+                        'tooth_detection_id': tooth['detection_id'],
+                        'tooth_class': tooth['tooth_class'],
+                        'tooth_number': tooth['tooth_number'],
+                        'tooth_type': tooth['tooth_type'],
+                        'problem': problem_name,
+                        'confidence': confidence,
+                        'bbox': box.xywh[0].tolist(), # Relative to crop
+                        'severity': 'medium', 
+                        'description': f"Detected {problem_name}",
+                        'detected_by': detector_name
+                    })
         
         logger.info(f"✅ Problem detection completed: {len(findings)} findings")
         if findings:
@@ -442,54 +646,55 @@ class PanoAIAnalyzer:
     def _map_problems_to_teeth(self, problem_detections: List[Dict], teeth_segments: List[Dict]) -> List[Dict]:
         """
         Helper: Map problem bounding boxes to the best matching tooth.
+        
+        A problem belongs to the tooth whose box contains its center; ties
+        go to the nearest tooth center (first one on equal distance).
         """
         mapped_findings = []
+        if not problem_detections or not teeth_segments:
+            return mapped_findings
+        
+        # Problem centers (P, 2) against tooth boxes (T, 4), all xywh center-based
+        centers = np.array([[p['bbox']['x'], p['bbox']['y']] for p in problem_detections], dtype=np.float64)
+        boxes = np.array(
+            [[t['bbox']['x'], t['bbox']['y'], t['bbox']['width'], t['bbox']['height']] for t in teeth_segments],
+            dtype=np.float64
+        )
+        
+        # Containment of every center in every tooth box, in one broadcast
+        t_whalf = boxes[:, 2] / 2
+        t_hhalf = boxes[:, 3] / 2
+        px = centers[:, 0:1]
+        py = centers[:, 1:2]
+        inside = (
+            (boxes[:, 0] - t_whalf <= px) & (px <= boxes[:, 0] + t_whalf) &
+            (boxes[:, 1] - t_hhalf <= py) & (py <= boxes[:, 1] + t_hhalf)
+        )
         
-        for problem in problem_detections:
+        # Squared distance to each containing tooth's center (sqrt not needed to rank)
+        dist_sq = np.where(inside, (px - boxes[:, 0]) ** 2 + (py - boxes[:, 1]) ** 2, np.inf)
+        best = dist_sq.argmin(axis=1)
+        matched = inside.any(axis=1)
+        
+        for problem, tooth_index, has_tooth in zip(problem_detections, best.tolist(), matched.tolist()):
+            if not has_tooth:
+                continue
+            best_tooth = teeth_segments[tooth_index]
             p_bbox = problem['bbox']
-            p_center_x = p_bbox['x']
-            p_center_y = p_bbox['y']
-            
-            best_tooth = None
-            min_dist = float('inf')
-            
-            import math
             
-            for tooth in teeth_segments:
-                t_bbox = tooth['bbox']
-                
-                # Check if problem center is roughly within tooth bounds (with some margin)
-                # t_bbox is xywh (center based)
-                t_whalf = t_bbox['width'] / 2
-                t_hhalf = t_bbox['height'] / 2
-                t_min_x = t_bbox['x'] - t_whalf
-                t_max_x = t_bbox['x'] + t_whalf
-                t_min_y = t_bbox['y'] - t_hhalf
-                t_max_y = t_bbox['y'] + t_hhalf
-                
-                # Check containment
-                if (t_min_x <= p_center_x <= t_max_x) and (t_min_y <= p_center_y <= t_max_y):
-                    # Found a container tooth. Verify distance to center for tie-breaking
-                    dist = math.sqrt((p_center_x - t_bbox['x'])**2 + (p_center_y - t_bbox['y'])**2)
-                    
-                    if dist < min_dist:
-                        min_dist = dist
-                        best_tooth = tooth
-            
-            if best_tooth:
-                # Assign to this tooth
-                mapped_findings.append({
-                    'tooth_detection_id': best_tooth['detection_id'],
-                    'tooth_class': best_tooth['tooth_class'],
-                    'tooth_number': best_tooth['tooth_number'],
-                    'tooth_type': best_tooth['tooth_type'],
-                    'problem': problem['problem'],
-                    'confidence': problem['confidence'],
-                    'bbox': [p_bbox['x'], p_bbox['y'], p_bbox['width'], p_bbox['height']],
-                    'severity': 'medium', 
-                    'description': f"Detected {problem['problem']} on full scan",
-                    'detected_by': problem['detector']
-                })
+            # Assign to this tooth
+            mapped_findings.append({
+                'tooth_detection_id': best_tooth['detection_id'],
+                'tooth_class': best_tooth['tooth_class'],
+                'tooth_number': best_tooth['tooth_number'],
+                'tooth_type': best_tooth['tooth_type'],
+                'problem': problem['problem'],
+                'confidence': problem['confidence'],
+                'bbox': [p_bbox['x'], p_bbox['y'], p_bbox['width'], p_bbox['height']],
+                'severity': 'medium', 
+                'description': f"Detected {problem['problem']} on full scan",
+                'detected_by': problem['detector']
+            })
         return mapped_findings
     
     def _generate_summary(self, findings: List[Dict]) -> Dict[str, Any]:
@@ -520,21 +725,26 @@ class PanoAIAnalyzer:
             'requires_attention': len(findings) > 0
         }
 
-    def _crop_tooth_image(self, image_path: str, bbox: Dict[str, float]):
+    def _load_image(self, image_path: str):
         """
-        Helper: Crop tooth region from original image.
-        bbox format: {'x': center_x, 'y': center_y, 'width': w, 'height': h}
+        Helper: Decode an image once as a BGR array.
+        
+        Returns:
+            numpy array, or None if the file can't be decoded
         """
         try:
             import cv2
-            import numpy as np
-            
-            # Load full image if not already kept (optimization: load once per analysis)
-            # For now load each time to keep stateless
-            img = cv2.imread(str(image_path))
-            if img is None:
-                return None
-            
+            return cv2.imread(str(image_path))
+        except Exception as e:
+            logger.error(f"❌ Error loading image: {e}")
+            return None
+
+    def _crop_tooth_image(self, img, bbox: Dict[str, float]):
+        """
+        Helper: Crop tooth region from the decoded original image.
+        bbox format: {'x': center_x, 'y': center_y, 'width': w, 'height': h}
+        """
+        try:
             img_h, img_w = img.shape[:2]
             
             # Convert xywh center to xyxy top-left/bottom-right
@@ -33,6 +33,19 @@ MULTIPROBLEM_DETECTION_CONFIG = [
 # Stratégie de détection: 'GLOBAL' (image entière) ou 'PER_TOOTH' (découpage par dent)
 DETECTION_STRATEGY = 'GLOBAL'  # Modifier ici pour changer le mode
 
+# Inférence YOLO en FP16 sur GPU (ignoré sur CPU)
+USE_HALF_PRECISION = os.getenv('AI_HALF_PRECISION', 'true').lower() == 'true'
+
+# Moteurs TensorRT (.engine) exportés une fois à côté des .pt puis réutilisés (GPU + tensorrt requis)
+USE_TENSORRT_ENGINES = os.getenv('AI_TENSORRT_ENGINES', 'false').lower() == 'true'
+
+# torch.compile du réseau PyTorch après chargement (compilation au warmup, GPU requis)
+USE_TORCH_COMPILE = os.getenv('AI_TORCH_COMPILE', 'false').lower() == 'true'
+
+# TF32 + autotuning cuDNN (cudnn.benchmark). Réglages GLOBAUX au processus : ils
+# s'appliquent aussi au CBCT / TotalSegmentator du même worker Celery
+USE_CUDA_TUNING = os.getenv('AI_CUDA_TUNING', 'false').lower() == 'true'
+
 # EXEMPLE 1: Configuration simple (2 modèles) - DEPRECATED
 SIMPLE_DETECTION_CONFIG_OLD = [
     {
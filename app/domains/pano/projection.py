@@ -28,10 +28,73 @@ def generate_synthetic_pano(volume_data, teeth_segments, output_path):
     Returns:
         bool: True if successful
     """
+    rendered = render_synthetic_pano(volume_data, teeth_segments)
+    if rendered is None:
+        return False
+    
+    pano_image, debug_image = rendered
+    
+    if debug_image is not None:
+        debug_path = output_path.replace('.jpg', '_debug.jpg')
+        cv2.imwrite(debug_path, debug_image)
+        logger.info(f"   🖼️ Saved Debug Axial View: {debug_path}")
+    
+    # Save Pano
+    cv2.imwrite(output_path, pano_image)
+    logger.info(f"✅ Pano generated and saved to {output_path}")
+    
+    return True
+
+
+def encode_synthetic_pano(volume_data, teeth_segments, quality=95):
+    """
+    Generates a synthetic panoramic image as JPEG bytes (nothing written to disk).
+    
+    Args:
+        volume_data: 3D numpy array (Z, Y, X)
+        teeth_segments: List of tooth dicts with 'bbox_3d'
+        quality: JPEG quality
+        
+    Returns:
+        tuple: (pano_bytes, debug_bytes or None), or (None, None) on failure
+    """
+    rendered = render_synthetic_pano(volume_data, teeth_segments)
+    if rendered is None:
+        return None, None
+    
+    pano_image, debug_image = rendered
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    
+    ok, pano_buffer = cv2.imencode('.jpg', pano_image, params)
+    if not ok:
+        logger.error("Failed to encode pano image")
+        return None, None
+    
+    debug_bytes = None
+    if debug_image is not None:
+        ok, debug_buffer = cv2.imencode('.jpg', debug_image, params)
+        if ok:
+            debug_bytes = debug_buffer.tobytes()
+    
+    logger.info("✅ Pano generated in memory")
+    return pano_buffer.tobytes(), debug_bytes
+
+
+def render_synthetic_pano(volume_data, teeth_segments):
+    """
+    Renders the synthetic panoramic image and the axial debug view.
+    
+    Args:
+        volume_data: 3D numpy array (Z, Y, X)
+        teeth_segments: List of tooth dicts with 'bbox_3d'
+        
+    Returns:
+        tuple: (pano uint8 image, debug BGR image or None), or None on failure
+    """
     try:
         if not teeth_segments:
             logger.warning("No teeth to generate pano curve.")
-            return False
+            return None
 
         points = []
         for t in teeth_segments:
@@ -84,6 +147,7 @@ def generate_synthetic_pano(volume_data, teeth_segments, output_path):
         x_curve, y_curve = splev(u_new, tck)
         
         # --- DEBUG: Generate Axial Curve View ---
+        debug_image = None
         try:
             # Axial MIP (Z-axis is index 2)
             axial_mip = np.mean(volume_data, axis=2) # Mean is clearer than Max for structure
@@ -119,9 +183,7 @@ def generate_synthetic_pano(volume_data, teeth_segments, output_path):
                 # p is (x, y). CV2 needs (y, x) for (col, row)
                 cv2.circle(axial_img, (int(p[1]), int(p[0])), 8, (0, 0, 255), -1)
 
-            debug_path = output_path.replace('.jpg', '_debug.jpg')
-            cv2.imwrite(debug_path, axial_img)
-            logger.info(f"   🖼️ Saved Debug Axial View: {debug_path}")
+            debug_image = axial_img
         except Exception as e:
             logger.warning(f"Failed to generate debug axial image: {e}")
         # ----------------------------------------
@@ -209,12 +271,8 @@ def generate_synthetic_pano(volume_data, teeth_segments, output_path):
         clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
         pano_enhanced = clahe.apply(pano_uint8)
         
-        # Save Pano
-        cv2.imwrite(output_path, pano_enhanced)
-        logger.info(f"✅ Pano generated and saved to {output_path}")
-        
-        return True
+        return pano_enhanced, debug_image
         
     except Exception as e:
         logger.error(f"Failed to generate pano: {e}")
-        return False
+        return None
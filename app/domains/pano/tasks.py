@@ -3,11 +3,10 @@ Panoramic Image Processing Tasks (V2)
 
 All pano workflow tasks consolidated in one file for simplicity.
 """
-from app.celery_app import celery
+from app.celery_app import celery, get_flask_app
 from app.services.job_status import JobStatusManager
 from app.services.supabase_manager import update_report_status
 from app.services.uploads import SupabaseUploadManager
-from app import create_app
 import os
 import logging
 
@@ -43,7 +42,7 @@ def validate_pano_task(self, file_info, report_id):
     """Validate panoramic image file."""
     task_id = self.request.id
     try:
-        app = create_app()
+        app = get_flask_app()
         with app.app_context():
             JobStatusManager.create_or_update_status(
                 task_id, 'processing', 'Validating pano image...', 10
@@ -77,7 +76,7 @@ def upload_pano_task(self, validation_result, clinic_id, patient_id, report_id):
     """Upload panoramic image to Supabase storage."""
     task_id = self.request.id
     try:
-        app = create_app()
+        app = get_flask_app()
         with app.app_context():
             JobStatusManager.create_or_update_status(
                 task_id, 'processing', 'Uploading pano image...', 30
@@ -141,7 +140,7 @@ def analyze_pano_task(self, upload_result, report_id):
     """
     task_id = self.request.id
     try:
-        app = create_app()
+        app = get_flask_app()
         with app.app_context():
             JobStatusManager.create_or_update_status(
                 task_id, 'processing', ' 👌👌 Analyzing pano image...', 60
@@ -155,9 +154,9 @@ def analyze_pano_task(self, upload_result, report_id):
 
             from app.domains.pano.logic import analyze_and_upload
             from app.domains.pano.config import SEGMENTATION_CONFIG, MULTIPROBLEM_DETECTION_CONFIG, DETECTION_STRATEGY
-            from app.services.model_manager import ModelManager
+            from app.services.model_cache import get_active_cached
 
-            active_models = ModelManager.get_active_model() # Returns dict now
+            active_models = get_active_cached() # Returns dict now
             
             detection_config_to_use = MULTIPROBLEM_DETECTION_CONFIG
             if active_models and 'pano_detection' in active_models:
@@ -234,7 +233,7 @@ def aggregate_pano_task(self, analysis_result, file_info, upload_id, clinic_id,
     """Aggregate pano workflow results."""
     task_id = self.request.id
     try:
-        app = create_app()
+        app = get_flask_app()
         with app.app_context():
             if report_id:
                 update_report_status(report_id, "completed")
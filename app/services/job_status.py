@@ -1,6 +1,9 @@
 import json
+import os
 import time
+import atexit
 import logging
+import threading
 from datetime import datetime
 from app.celery_app import redis_client
 
@@ -13,6 +16,17 @@ class JobStatusManager:
     REDIS_TTL = 86400  # 24 hours
     MAX_RETRIES = 3
 
+    # Progress updates are informational: queue them for a background
+    # writer; terminal statuses are still written before the task returns
+    ASYNC_STATUSES = frozenset({'processing'})
+    FLUSH_INTERVAL = 0.05  # seconds
+
+    _pending = {}  # job_id -> latest queued job_data (older ones coalesce)
+    _pending_lock = threading.Lock()
+    _write_lock = threading.Lock()  # orders background flushes vs direct writes
+    _wakeup = threading.Event()
+    _writer_pid = None
+
     @classmethod
     def _get_job_key(cls, job_id):
         return f"job_status:{job_id}"
@@ -32,20 +46,71 @@ class JobStatusManager:
             'timestamp': datetime.utcnow().isoformat()
         }
 
+        if status in cls.ASYNC_STATUSES:
+            cls._ensure_writer()
+            with cls._pending_lock:
+                cls._pending[job_id] = job_data
+            cls._wakeup.set()
+            return job_data
+
+        with cls._write_lock:
+            # A queued progress update must not land after this one
+            with cls._pending_lock:
+                cls._pending.pop(job_id, None)
+            if cls._write([job_data]):
+                logger.info(f"Job status updated: {job_id} - {status} ({progress}%)")
+                return job_data
+            return None
+
+    @classmethod
+    def flush(cls):
+        """Write all queued progress updates now."""
+        with cls._write_lock:
+            with cls._pending_lock:
+                batch, cls._pending = list(cls._pending.values()), {}
+            if batch:
+                cls._write(batch)
+
+    @classmethod
+    def _write(cls, batch):
+        """Store a batch of job_data dicts in one Redis pipeline, with retries."""
         for attempt in range(cls.MAX_RETRIES):
             try:
                 pipe = redis_client.pipeline()
-                pipe.setex(cls._get_job_key(job_id), cls.REDIS_TTL, json.dumps(job_data))
-                pipe.zadd("job_timestamps", {job_id: time.time()})
+                for job_data in batch:
+                    pipe.setex(cls._get_job_key(job_data['job_id']), cls.REDIS_TTL, json.dumps(job_data))
+                    pipe.zadd("job_timestamps", {job_data['job_id']: time.time()})
                 pipe.execute()
-                logger.info(f"Job status updated: {job_id} - {status} ({progress}%)")
-                return job_data
+                return True
             except Exception as e:
                 if attempt < cls.MAX_RETRIES - 1:
                     time.sleep(0.5 * (2 ** attempt))
                 else:
                     logger.error(f"Failed to store in Redis after {cls.MAX_RETRIES} attempts: {e}")
-                    return None
+                    return False
+
+    @classmethod
+    def _ensure_writer(cls):
+        """Start the background writer (again after a fork: threads don't survive it)."""
+        pid = os.getpid()
+        if cls._writer_pid == pid:
+            return
+        with cls._pending_lock:
+            if cls._writer_pid == pid:
+                return
+            cls._writer_pid = pid
+            threading.Thread(target=cls._writer_loop, name='job-status-writer', daemon=True).start()
+
+    @classmethod
+    def _writer_loop(cls):
+        while True:
+            cls._wakeup.wait()
+            time.sleep(cls.FLUSH_INTERVAL)  # Let a burst of updates coalesce
+            cls._wakeup.clear()
+            try:
+                cls.flush()
+            except Exception as e:
+                logger.warning(f"Job status flush failed: {e}")
 
     @classmethod
     def get_status(cls, job_id):
@@ -82,3 +147,4 @@ class JobStatusManager:
             return []
 
 
+atexit.register(JobStatusManager.flush)
@@ -0,0 +1,110 @@
+"""
+Model Registry Cache
+
+Short-lived Redis cache for resolved model records, so the per-request
+and per-job lookups skip the registry hash walk and the local config import.
+"""
+import logging
+import orjson
+
+from app.celery_app import redis_client
+from app.services.model_manager import ModelManager
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_KEY_PREFIX = "active_model:"
+MODELS_VERSION_KEY = "models:version"
+MODELS_LIST_KEY = "models:list:v{version}"
+CACHE_TTL = 300  # seconds
+
+
+def get_active_cached(model_type=None):
+    """
+    Cached ModelManager.get_active_model().
+    
+    Args:
+        model_type: Optional model type; None returns all active models
+        
+    Returns:
+        Same value as ModelManager.get_active_model(model_type)
+    """
+    key = f"{ACTIVE_KEY_PREFIX}{model_type or 'all'}"
+    
+    cached = _get(key)
+    if cached is not None:
+        return cached
+    
+    active = ModelManager.get_active_model(model_type)
+    if active:
+        _setex(key, active)
+    return active
+
+
+def get_all_models_cached():
+    """
+    Cached ModelManager.get_all_models(), keyed by registry version.
+    
+    Returns:
+        List of model records
+    """
+    key = None
+    if redis_client:
+        try:
+            version = int(redis_client.get(MODELS_VERSION_KEY) or 0)
+            key = MODELS_LIST_KEY.format(version=version)
+        except Exception as e:
+            logger.warning(f"Model cache unavailable: {e}")
+    
+    if key:
+        cached = _get(key)
+        if cached is not None:
+            return cached
+    
+    models = ModelManager.get_all_models()
+    if key and models:
+        _setex(key, models)
+    return models
+
+
+def invalidate_active_models() -> None:
+    """Drop every cached active-model record."""
+    if not redis_client:
+        return
+    
+    try:
+        keys = list(redis_client.scan_iter(match=f"{ACTIVE_KEY_PREFIX}*", count=100))
+        if keys:
+            redis_client.delete(*keys)
+    except Exception as e:
+        logger.warning(f"Failed to invalidate active model cache: {e}")
+
+
+def invalidate_models_list() -> None:
+    """Bump the registry version so the next list call repopulates."""
+    if not redis_client:
+        return
+    
+    try:
+        redis_client.incr(MODELS_VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Failed to invalidate model list cache: {e}")
+
+
+def _get(key):
+    if not redis_client:
+        return None
+    try:
+        raw = redis_client.get(key)
+        return orjson.loads(raw) if raw else None
+    except Exception as e:
+        logger.warning(f"Model cache read failed for {key}: {e}")
+        return None
+
+
+def _setex(key, value) -> None:
+    if not redis_client:
+        return
+    try:
+        redis_client.setex(key, CACHE_TTL, orjson.dumps(value))
+    except Exception as e:
+        logger.warning(f"Model cache write failed for {key}: {e}")
@@ -1,5 +1,6 @@
 import json
 import logging
+import os
 from app.celery_app import redis_client
 import uuid
 
@@ -192,6 +193,33 @@ class ModelManager:
                 
         return active_models
 
+    @classmethod
+    def preload_active_models(cls):
+        """
+        Ask the kernel to read active model weight files into the page cache.
+        
+        Returns:
+            Number of model files warmed
+        """
+        if not hasattr(os, 'posix_fadvise'):
+            return 0
+        
+        count = 0
+        for model in (cls.get_active_model() or {}).values():
+            path = model.get('path')
+            if not path or not os.path.exists(path):
+                continue
+            try:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                finally:
+                    os.close(fd)
+                count += 1
+            except OSError as e:
+                logger.warning(f"Could not preload model file {path}: {e}")
+        return count
+
     @classmethod
     def _get_model_by_id(cls, model_id):
         raw = redis_client.hget(cls.MODELS_KEY, model_id)
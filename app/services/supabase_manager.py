@@ -1,7 +1,13 @@
 from flask import current_app
 
+from app.config import get_supabase as get_shared_supabase
+
 
 def get_supabase():
+    try:
+        return get_shared_supabase()
+    except RuntimeError:
+        pass
     try:
         return current_app.extensions.get('supabase') if hasattr(current_app, 'extensions') else None
     except Exception:
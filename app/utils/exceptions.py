@@ -10,6 +10,11 @@ class FileUploadError(Exception):
     pass
 
 
+class FileTooLargeError(FileUploadError):
+    """Exception raised when an upload exceeds the allowed size."""
+    pass
+
+
 class ValidationError(Exception):
     """Exception raised for validation errors."""
     pass
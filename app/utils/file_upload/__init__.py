@@ -1,14 +1,23 @@
 """
 File Upload Utilities
 """
-from .validators import validate_file_request
-from .handlers import save_uploaded_file
+from .validators import validate_file_request, validate_filename
+from .handlers import (
+    save_uploaded_file,
+    stream_multipart_upload,
+    finalize_streamed_file,
+    inflate_gzip_upload
+)
 from .helpers import extract_form_params
 from .downloader import download_file_from_url
 
 __all__ = [
     'validate_file_request',
+    'validate_filename',
     'save_uploaded_file',
+    'stream_multipart_upload',
+    'finalize_streamed_file',
+    'inflate_gzip_upload',
     'extract_form_params',
     'download_file_from_url'
 ]
@@ -5,12 +5,18 @@ Utility to download files from URLs for remote upload.
 """
 import requests
 import os
+import shutil
 import logging
 from pathlib import Path
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
+DOWNLOAD_CHUNK_SIZE = 1 << 20  # 1 MB
+
+# Shared session keeps connections to storage alive between downloads
+_session = requests.Session()
+
 
 def download_file_from_url(url: str, upload_folder: str, timeout: int = 60) -> dict:
     """
@@ -37,7 +43,7 @@ def download_file_from_url(url: str, upload_folder: str, timeout: int = 60) -> d
         logger.info(f"Downloading file from URL: {url}")
         
         # Download with streaming
-        response = requests.get(url, stream=True, timeout=timeout)
+        response = _session.get(url, stream=True, timeout=timeout)
         response.raise_for_status()
         
         # Extract filename from URL or Content-Disposition header
@@ -56,10 +62,10 @@ def download_file_from_url(url: str, upload_folder: str, timeout: int = 60) -> d
         # Save file
         filepath = os.path.join(upload_folder, filename)
         
-        with open(filepath, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
+        # Copy the raw socket stream in large blocks (no per-chunk Python loop)
+        response.raw.decode_content = True
+        with response, open(filepath, 'wb') as f:
+            shutil.copyfileobj(response.raw, f, length=DOWNLOAD_CHUNK_SIZE)
         
         file_size = os.path.getsize(filepath)
         
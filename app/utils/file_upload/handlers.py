@@ -3,12 +3,23 @@ File Upload Handlers
 
 Functions for saving and managing uploaded files.
 """
-from typing import Tuple, Optional
+from typing import Dict, Tuple, Optional
 from werkzeug.datastructures import FileStorage
+from streaming_form_data import StreamingFormDataParser
+from streaming_form_data.targets import FileTarget, ValueTarget
 import os
+import gzip
+import logging
 import uuid
 
-from app.utils.exceptions import FileUploadError
+from app.utils.exceptions import FileUploadError, FileTooLargeError
+
+logger = logging.getLogger(__name__)
+
+# Form fields accepted alongside the uploaded file
+FORM_FIELDS = ('report_id', 'clinic_id', 'patient_id', 'upload_id', 'report_type', 'file_url')
+STREAM_CHUNK_SIZE = 64 * 1024
+COPY_CHUNK_SIZE = 1 << 20
 
 
 def get_file_size(file: FileStorage) -> int:
@@ -68,3 +79,150 @@ def save_uploaded_file(
         raise FileUploadError(f'Failed to save file: {str(e)}')
     
     return save_path, file_size, upload_id
+
+
+def stream_multipart_upload(
+    stream,
+    headers,
+    upload_folder: str,
+    max_size: Optional[int] = None
+) -> Tuple[Dict[str, Optional[str]], Optional[str], Optional[str], int]:
+    """
+    Parse a multipart body straight from the request stream.
+    
+    The 'file' part is written to a temporary path inside the upload folder
+    as it arrives, so nothing is buffered or spooled by Werkzeug.
+    
+    Args:
+        stream: Raw request input stream
+        headers: Request headers (must carry the multipart boundary)
+        upload_folder: Folder to write the file part into
+        max_size: Maximum request body size in bytes
+    
+    Returns:
+        Tuple of (form_values, part_path, original_filename, file_size)
+        part_path and original_filename are None when no file part was sent
+    
+    Raises:
+        FileTooLargeError: If the body exceeds max_size
+        FileUploadError: If the body cannot be parsed
+    """
+    os.makedirs(upload_folder, exist_ok=True)
+    part_path = os.path.join(upload_folder, f"{uuid.uuid4().hex}.part")
+    
+    file_target = FileTarget(part_path)
+    value_targets = {name: ValueTarget() for name in FORM_FIELDS}
+    
+    try:
+        parser = StreamingFormDataParser(headers=headers)
+        parser.register('file', file_target)
+        for name, target in value_targets.items():
+            parser.register(name, target)
+        
+        bytes_read = 0
+        while chunk := stream.read(STREAM_CHUNK_SIZE):
+            bytes_read += len(chunk)
+            if max_size and bytes_read > max_size:
+                max_mb = max_size / (1024 * 1024)
+                raise FileTooLargeError(f'File too large. Maximum size: {max_mb:.1f} MB')
+            parser.data_received(chunk)
+    except FileUploadError:
+        _remove_quietly(part_path)
+        raise
+    except Exception as e:
+        _remove_quietly(part_path)
+        raise FileUploadError(f'Failed to parse upload: {str(e)}')
+    
+    form_values = {
+        name: (target.value.decode('utf-8') or None)
+        for name, target in value_targets.items()
+    }
+    
+    if not file_target.multipart_filename or not os.path.exists(part_path):
+        _remove_quietly(part_path)
+        return form_values, None, None, 0
+    
+    return form_values, part_path, file_target.multipart_filename, os.path.getsize(part_path)
+
+
+def finalize_streamed_file(
+    part_path: str,
+    filename: str,
+    upload_folder: str,
+    upload_id: Optional[str] = None
+) -> Tuple[str, str]:
+    """
+    Move a streamed file part to its final upload path.
+    
+    Args:
+        part_path: Temporary path written by stream_multipart_upload
+        filename: Sanitized filename
+        upload_folder: Folder to save in
+        upload_id: Optional upload ID (generated if not provided)
+    
+    Returns:
+        Tuple of (save_path, upload_id)
+    
+    Raises:
+        FileUploadError: If the move fails
+    """
+    upload_id = upload_id or str(uuid.uuid4())
+    save_path = os.path.join(upload_folder, f"{upload_id}_{filename}")
+    
+    try:
+        os.replace(part_path, save_path)  # Same filesystem: rename, no copy
+    except Exception as e:
+        _remove_quietly(part_path)
+        raise FileUploadError(f'Failed to save file: {str(e)}')
+    
+    return save_path, upload_id
+
+
+def inflate_gzip_upload(save_path: str, max_size: Optional[int] = None) -> str:
+    """
+    Decompress a saved .gz upload in place of the original.
+    
+    Lets downstream readers (e.g. nibabel on .nii) memory-map the file
+    instead of inflating it again on every load.
+    
+    Args:
+        save_path: Path of the saved .gz file
+        max_size: Maximum decompressed size in bytes (None = unbounded)
+    
+    Returns:
+        Path of the decompressed file (save_path without '.gz')
+    
+    Raises:
+        FileTooLargeError: If the decompressed data exceeds max_size
+        FileUploadError: If the file is not valid gzip
+    """
+    inflated_path = save_path[:-3]
+    pre_size = os.path.getsize(save_path)
+    written = 0
+    
+    try:
+        with gzip.open(save_path, 'rb') as src, open(inflated_path, 'wb') as dst:
+            # Counted copy: stop a gzip bomb before it fills the disk
+            while chunk := src.read(COPY_CHUNK_SIZE):
+                written += len(chunk)
+                if max_size and written > max_size:
+                    max_mb = max_size / (1024 * 1024)
+                    raise FileTooLargeError(f'Decompressed file too large. Maximum size: {max_mb:.1f} MB')
+                dst.write(chunk)
+    except FileTooLargeError:
+        _remove_quietly(inflated_path)
+        raise
+    except (OSError, EOFError) as e:
+        _remove_quietly(inflated_path)
+        raise FileUploadError(f'Invalid gzip file: {str(e)}')
+    
+    os.remove(save_path)
+    logger.info(f"Inflated upload {os.path.basename(save_path)}: {pre_size} -> {os.path.getsize(inflated_path)} bytes")
+    return inflated_path
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
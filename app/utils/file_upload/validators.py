@@ -32,6 +32,26 @@ def validate_file_request(
         raise FileUploadError('No file provided')
     
     filename = file.filename
+    return filename, validate_filename(filename, allowed_extensions)
+
+
+def validate_filename(filename: Optional[str], allowed_extensions: set) -> str:
+    """
+    Validate a client-supplied filename against allowed extensions.
+    
+    Args:
+        filename: Original filename from the upload
+        allowed_extensions: Set of allowed extensions (e.g., {'.jpg', '.png'})
+        
+    Returns:
+        Sanitized filename
+        
+    Raises:
+        FileUploadError: If validation fails
+    """
+    if not filename:
+        raise FileUploadError('No file provided')
+    
     file_ext = os.path.splitext(filename.lower())[1]
     
     if file_ext not in allowed_extensions:
@@ -40,5 +60,4 @@ def validate_file_request(
             f'File type not allowed. Allowed extensions: {allowed_list}'
         )
     
-    sanitized_filename = secure_filename(filename)
-    return filename, sanitized_filename
+    return secure_filename(filename)
@@ -1,12 +1,30 @@
-from app.celery_app import redis_client
+from app.celery_app import redis_client, PENDING_TASKS_KEY, PENDING_TASKS_TTL, DECR_FLOOR_LUA, reconcile_pending_tasks
 from app.config import Config
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Reserve a slot only while below the limit: 1 = full, 0 = reserved
+RESERVE_SLOT_LUA = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') >= tonumber(ARGV[1]) then
+    return 1
+end
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 0
+"""
+
+_reserve_slot = redis_client.register_script(RESERVE_SLOT_LUA) if redis_client else None
+_release_slot = redis_client.register_script(DECR_FLOOR_LUA) if redis_client else None
+
 def is_queue_full() -> bool:
     """
-    Check if the main Celery queue has reached its maximum capacity.
+    Check if the Celery queue has reached its maximum capacity.
+    
+    Reads the pending_tasks counter maintained by the Celery publish/prerun
+    signals and, when there is room, atomically reserves a slot so concurrent
+    uploads cannot all slip past the limit. Callers that get False must call
+    release_queue_slot() once their workflow has been published.
     
     Returns:
         bool: True if queue is full, False otherwise.
@@ -18,15 +36,26 @@ def is_queue_full() -> bool:
         return False
         
     try:
-        # 'celery' is the default queue name in Celery
-        queue_len = redis_client.llen('celery')
-        logger.debug(f"Current queue length: {queue_len}")
-        
-        if queue_len >= Config.MAX_QUEUE_SIZE:
-            logger.warning(f"Queue full! Current: {queue_len}, Max: {Config.MAX_QUEUE_SIZE}")
-            return True
+        args = [Config.MAX_QUEUE_SIZE, PENDING_TASKS_TTL]
+        if _reserve_slot(keys=[PENDING_TASKS_KEY], args=args):
+            # The counter can drift above the real queue (tasks that never
+            # ran); re-sync from the broker before turning the upload away
+            reconcile_pending_tasks()
+            if _reserve_slot(keys=[PENDING_TASKS_KEY], args=args):
+                logger.warning(f"Queue full! Max: {Config.MAX_QUEUE_SIZE}")
+                return True
             
         return False
     except Exception as e:
         logger.error(f"Error checking queue size: {e}")
         return False
+
+def release_queue_slot() -> None:
+    """Release a slot reserved by is_queue_full(); published tasks count themselves."""
+    if not redis_client:
+        return
+    
+    try:
+        _release_slot(keys=[PENDING_TASKS_KEY])
+    except Exception as e:
+        logger.error(f"Error releasing queue slot: {e}")
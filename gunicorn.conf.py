@@ -0,0 +1,26 @@
+"""
+Gunicorn configuration for the web service.
+
+Threaded workers keep one process serving many concurrent uploads: request
+bodies are streamed straight to disk, so each in-flight upload only holds a
+thread that is mostly waiting on the socket.
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5030')}"
+workers = int(os.getenv('WEB_WORKERS', 2))
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', 32))
+timeout = int(os.getenv('WEB_TIMEOUT', 600))  # Large CBCT uploads over slow links
+keepalive = 5
+
+# Build the app once in the master (PRELOAD=true) so forked workers share
+# imported modules and warmed model pages copy-on-write
+preload_app = os.getenv('PRELOAD', 'false').lower() == 'true'
+
+
+def post_fork(server, worker):
+    # The queued-logging listener thread does not survive fork
+    if preload_app:
+        from app import reset_logging
+        reset_logging()
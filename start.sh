@@ -7,4 +7,4 @@ celery -A app.celery_app.celery worker --loglevel=info --pool=solo --concurrency
 
 # 2. Start Web Server
 echo "Starting Web Server..."
-python run.py
\ No newline at end of file
+gunicorn -c gunicorn.conf.py run:app
\ No newline at end of file